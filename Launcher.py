@@ -1,35 +1,153 @@
 import os
+import subprocess
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-#ejecutar la carga de datos
-def ManejoDatos():
-    os.system("py Proyecto_Final.py --update")
-    time.sleep(2)
+# carpeta del proyecto, el dashboard se inicia desde aqui
+RAIZ = os.path.dirname(os.path.abspath(__file__))
 
+# puerto del dashboard, se puede cambiar con la variable PROYECTO_PUERTO
+PUERTO = os.environ.get("PROYECTO_PUERTO", "8501")
 
-#ejecutar Streamlit
+# el launcher se queda abierto: las actualizaciones corren en un hilo de este mismo
+# proceso (pandas, sqlalchemy y datos.ingesta se importan una sola vez)
+# y el dashboard es un subproceso que se puede iniciar, detener y revisar
+_pool = ThreadPoolExecutor(max_workers=1)
+_actualizacion = None
+_progreso = {"hechas": 0, "total": 0, "inicio": None, "fin": None}
+_dashboard = None
+_lock = threading.Lock()
+
+
+#el modulo de actualizacion se importa la primera vez que se necesita, asi el menu
+#aparece de inmediato y las siguientes actualizaciones ya no pagan los imports.
+#datos.ingesta no importa streamlit ni plotly, eso solo lo carga el dashboard
+def proyecto():
+    from datos import ingesta
+    return ingesta
+
+
+def registrar_progreso(hechas, total):
+    with _lock:
+        _progreso["hechas"], _progreso["total"] = hechas, total
+
+
+#corre la actualizacion en este proceso, solo las series pendientes
+#o todas si forzar=True
+def actualizar(forzar):
+    pf = proyecto()
+    _progreso["inicio"], _progreso["fin"] = time.time(), None
+    try:
+        series = pf.series_pendientes(forzar=forzar)
+        registrar_progreso(0, len(series))
+        if not series:
+            print("\nNo hay series pendientes, todas estan al dia")
+            return {}
+        return pf.actualizar_todo(series, progreso=registrar_progreso)
+    finally:
+        _progreso["fin"] = time.time()
+
+
+#ejecutar la carga de datos en segundo plano, el menu y el dashboard siguen
+#funcionando. Cuando termina se publica una version nueva de datos y el
+#dashboard la toma en el siguiente rerun
+def ManejoDatos(forzar=False):
+    global _actualizacion
+
+    if _actualizacion is not None and not _actualizacion.done():
+        print("\nYa hay una actualizacion en curso")
+        return
+
+    _actualizacion = _pool.submit(actualizar, forzar)
+    print("\nActualizacion iniciada en segundo plano (opción 4 para ver el avance)")
+
+
+#ejecutar Streamlit como subproceso con el mismo python que el launcher
 def Visualizacion():
-    os.system("py -m streamlit run Proyecto_Final.py")
-    time.sleep(2)
+    global _dashboard
+
+    if _dashboard is not None and _dashboard.poll() is None:
+        print(f"\nEl dashboard ya esta corriendo en http://localhost:{PUERTO}")
+        return
+
+    _dashboard = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "Proyecto_Final.py",
+         f"--server.port={PUERTO}", "--server.headless=true"],
+        cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    threading.Thread(target=vigilar_dashboard, args=(_dashboard,), daemon=True).start()
+    print(f"\nDashboard iniciado en http://localhost:{PUERTO}")
+
+
+#avisa si el dashboard se cae solo (no cuando lo detiene el menu)
+def vigilar_dashboard(proceso):
+    errores = proceso.stderr.read()
+    codigo = proceso.wait()
+    if codigo not in (0, -15) and proceso is _dashboard:
+        print(f"\n[WARN] el dashboard termino con codigo {codigo}\n{errores[-2000:]}")
+
+
+def detener_dashboard():
+    global _dashboard
+
+    if _dashboard is None or _dashboard.poll() is not None:
+        print("\nEl dashboard no esta corriendo")
+        return
+
+    proceso, _dashboard = _dashboard, None
+    proceso.terminate()
+    try:
+        proceso.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+    print("\nDashboard detenido")
+
+
+def estado():
+    print("\n           ESTADO")
+    if _actualizacion is None:
+        print("Actualizacion: no se ha ejecutado")
+    elif not _actualizacion.done():
+        with _lock:
+            hechas, total = _progreso["hechas"], _progreso["total"]
+        transcurrido = time.time() - _progreso["inicio"]
+        print(f"Actualizacion: en curso, {hechas} de {total} series ({transcurrido:.0f} s)")
+    elif _actualizacion.exception() is not None:
+        print(f"Actualizacion: fallo ({_actualizacion.exception()})")
+    else:
+        resultados = _actualizacion.result()
+        exitos = sum(1 for r in resultados.values() if r == "ok")
+        duracion = _progreso["fin"] - _progreso["inicio"]
+        print(f"Actualizacion: terminada, {exitos} de {len(resultados)} series ({duracion:.0f} s)")
+
+    if _dashboard is not None and _dashboard.poll() is None:
+        print(f"Dashboard: corriendo en http://localhost:{PUERTO} (pid {_dashboard.pid})")
+    else:
+        print("Dashboard: detenido")
 
 
 #Buen día Maestro
 #Para que funcione el proyecto es necesario que tenga creada la Base de datos "Proyecto" en SQL Server.
 #Primero tiene que ejecutar la primera opción que es la que actualiza los indicadores y los guarda en SQL Server,
-#son varias tablas así que por favor tenga paciencia.
+#son varias tablas así que por favor tenga paciencia. La actualizacion corre en segundo plano,
+#con la opción 4 puede ver cuantas series van.
 #Después debe de iniciar la visualización. En esta parte también trabajamos con datos y llamamos
-#las tablas desde python a SQL Server.
+#las tablas desde python a SQL Server. Puede volver a actualizar con el dashboard abierto,
+#al terminar el dashboard muestra los datos nuevos.
 #Debera de analizar cual es el driver de SQL Server de su computadora
-# y cambiar en el archivo "Proyecto_Final.py" el usuario y los drivers. Por favor
-# Y Nada mas por si acaso, debera de revisar si su consola funciona con py o python,
-# en nuestro caso utilizamos "py" para ejecutar los comandos.
+# y cambiar en el archivo "datos/ingesta.py" (conexion_mssql) el usuario y los drivers. Por favor
+# El launcher usa el mismo python con el que se ejecuta, ya no importa si su consola usa py o python.
 def main_menu():
-    opc = 0
-    while opc !=3:
-        print("           MENÚ PRINCIPAL")
+    while True:
+        print("\n           MENÚ PRINCIPAL")
         print("1. Actualizar indicadores y guardar en SQL Server")
-        print("2. Iniciar visualización (Dashboard Streamlit)")
-        print("3. Salir")
+        print("2. Actualizar todo el catalogo (aunque no le toque)")
+        print("3. Iniciar visualización (Dashboard Streamlit)")
+        print("4. Ver estado")
+        print("5. Detener visualización")
+        print("6. Salir")
 
         opcion = input("Seleccione una opción: ")
 
@@ -37,9 +155,23 @@ def main_menu():
             ManejoDatos()
 
         elif opcion == "2":
-            Visualizacion()
+            ManejoDatos(forzar=True)
 
         elif opcion == "3":
+            Visualizacion()
+
+        elif opcion == "4":
+            estado()
+
+        elif opcion == "5":
+            detener_dashboard()
+
+        elif opcion == "6":
+            if _actualizacion is not None and not _actualizacion.done():
+                print("\nEsperando a que termine la actualizacion...")
+                _actualizacion.exception()
+            if _dashboard is not None and _dashboard.poll() is None:
+                detener_dashboard()
             print("\nSaliendo del programa...")
             break
 
@@ -0,0 +1,416 @@
+#benchmarks del proyecto, mide lo mismo cada vez para poder comparar commits:
+#  - tiempo de punta a punta de "Proyecto_Final.py --update" contra un servidor
+#    local que imita el api del Banco Mundial y una base SQLite temporal
+#  - velocidad de parseo de get_indicator (registros por segundo)
+#  - primer render y rerun de cada pagina de pages/ con AppTest de Streamlit
+#  - carga masiva (--bulk) de un WDI_CSV.zip sintetico, si se pide --bulk-indicadores
+#  - tiempo de importacion del actualizador (python -X importtime -c "import datos.ingesta")
+#    contra un presupuesto; si se pasa o si importa streamlit, plotly o requests el script sale con 1
+#El resultado se guarda en JSON (por defecto benchmarks/resultados/<commit>.json)
+#
+#Uso:  python benchmarks/benchmark.py --anios=60 --paises-extra=50 --repeticiones=3
+#      python benchmarks/benchmark.py --comparar=benchmarks/resultados/abc1234.json
+#      python benchmarks/benchmark.py --sin-paginas --bulk-indicadores=200
+#      python benchmarks/benchmark.py --solo-importacion --presupuesto-import-ms=700
+#En benchmarks/fixtures hay un WDICSV.csv chico para probar la carga masiva a mano:
+#      PROYECTO_ESQUEMA=hechos py Proyecto_Final.py --bulk=benchmarks/fixtures/WDICSV.csv
+import argparse
+import csv
+import io
+import glob
+import hashlib
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANIO_FIN = 2024
+
+
+#valor sintetico pero siempre igual para el mismo pais, indicador y año,
+#alrededor de 1 de cada 20 valores es nulo como pasa en el api real
+def valor_sintetico(country, indicator, anio):
+    h = int(hashlib.md5(f"{country}|{indicator}|{anio}".encode()).hexdigest()[:8], 16)
+    if h % 20 == 0:
+        return None
+    return round((h % 20000) / 1000 - 5, 3)
+
+
+#arma los registros con el mismo formato que data[1] del api
+def registros_sinteticos(countries, indicator, anios, desde=None, hasta=None):
+    registros = []
+    for country in countries:
+        for anio in range(ANIO_FIN, ANIO_FIN - anios, -1):
+            if (desde and anio < desde) or (hasta and anio > hasta):
+                continue
+            registros.append({
+                "indicator": {"id": indicator, "value": indicator},
+                "country": {"id": country, "value": country},
+                "countryiso3code": "",
+                "date": str(anio),
+                "value": valor_sintetico(country, indicator, anio),
+                "unit": "",
+                "obs_status": "",
+                "decimal": 1,
+            })
+    return registros
+
+
+#servidor que contesta /v2/country/MX;US/indicator/XXX con paginacion
+def crear_servidor(anios):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            partes = url.path.strip("/").split("/")
+            params = parse_qs(url.query)
+
+            if len(partes) != 5 or partes[1] != "country" or partes[3] != "indicator":
+                self.send_error(404)
+                return
+
+            desde = hasta = None
+            if "date" in params:
+                desde, hasta = (int(x) for x in params["date"][0].split(":"))
+
+            registros = registros_sinteticos(partes[2].split(";"), partes[4], anios, desde, hasta)
+            por_pagina = int(params.get("per_page", ["50"])[0])
+            pagina = int(params.get("page", ["1"])[0])
+            paginas = max(1, math.ceil(len(registros) / por_pagina))
+            inicio = (pagina - 1) * por_pagina
+
+            cuerpo = json.dumps([
+                {"page": pagina, "pages": paginas, "per_page": por_pagina, "total": len(registros)},
+                registros[inicio:inicio + por_pagina],
+            ]).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+#catalogo de prueba: el catalogo real mas paises sinteticos (X00, X01, ...)
+def crear_catalogo(ruta, paises_extra):
+    with open(os.path.join(RAIZ, "catalogo.json"), encoding="utf-8") as f:
+        catalogo = json.load(f)
+    for n in range(paises_extra):
+        catalogo["paises"][f"X{n:02d}"] = f"Sintético {n}"
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(catalogo, f, ensure_ascii=False)
+    return catalogo
+
+
+#variables de entorno para que todo el proyecto use la carpeta temporal
+def entorno_prueba(carpeta, api_url):
+    return {
+        "PROYECTO_BACKEND": "sqlite",
+        "PROYECTO_SQLITE": os.path.join(carpeta, "proyecto.db"),
+        "PROYECTO_API_URL": api_url,
+        "PROYECTO_CATALOGO": os.path.join(carpeta, "catalogo.json"),
+        "PROYECTO_ESTADO": os.path.join(carpeta, "estado.json"),
+        "PROYECTO_VERSION_FILE": os.path.join(carpeta, "data_version.txt"),
+        "PROYECTO_HTTP_CACHE": os.path.join(carpeta, "cache_http"),
+        "PROYECTO_SNAPSHOTS": os.path.join(carpeta, "snapshots"),
+        "PROYECTO_BULK_CHECKPOINT": os.path.join(carpeta, "bulk_checkpoint.json"),
+    }
+
+
+#borra todo lo que deja un --update para que cada repeticion empiece de cero
+def limpiar(entorno):
+    for clave in ("PROYECTO_SQLITE", "PROYECTO_ESTADO", "PROYECTO_VERSION_FILE", "PROYECTO_BULK_CHECKPOINT"):
+        if os.path.exists(entorno[clave]):
+            os.remove(entorno[clave])
+    for clave in ("PROYECTO_HTTP_CACHE", "PROYECTO_SNAPSHOTS"):
+        shutil.rmtree(entorno[clave], ignore_errors=True)
+
+
+def resumen(tiempos):
+    return {
+        "mediana_s": statistics.median(tiempos),
+        "min_s": min(tiempos),
+        "max_s": max(tiempos),
+        "repeticiones": len(tiempos),
+    }
+
+
+#corre "python -m datos --update --force" en otro proceso, como lo haria un cron
+def medir_update(entorno, repeticiones, workers):
+    tiempos = []
+    for _ in range(repeticiones):
+        limpiar(entorno)
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, "-m", "datos", "--update", "--force", f"--workers={workers}"],
+            cwd=RAIZ, env={**os.environ, **entorno}, capture_output=True, text=True
+        )
+        tiempos.append(time.perf_counter() - inicio)
+        if proceso.returncode != 0:
+            raise RuntimeError(f"--update fallo:\n{proceso.stdout}\n{proceso.stderr}")
+    return resumen(tiempos)
+
+
+#arma un WDI_CSV.zip con el mismo formato que el del Banco Mundial (WDICSV.csv con
+#una columna por año y WDICountry.csv con los codigos ISO2). Regresa la ruta y
+#cuantos valores no vacios tiene
+def crear_wdi_sintetico(carpeta, countries, indicadores, anios):
+    columnas_anios = [str(a) for a in range(ANIO_FIN - anios + 1, ANIO_FIN + 1)]
+    datos, paises = io.StringIO(), io.StringIO()
+    escritor = csv.writer(datos)
+    escritor.writerow(["Country Name", "Country Code", "Indicator Name", "Indicator Code"] + columnas_anios)
+    valores = 0
+    for n in range(indicadores):
+        indicator = f"SIN.TETICO.{n:04d}"
+        for country in countries:
+            fila = [valor_sintetico(country, indicator, int(a)) for a in columnas_anios]
+            valores += sum(v is not None for v in fila)
+            escritor.writerow([country, f"{country}X", indicator, indicator] + ["" if v is None else v for v in fila])
+
+    escritor = csv.writer(paises)
+    escritor.writerow(["Country Code", "Short Name", "Table Name", "2-alpha code"])
+    for country in countries:
+        escritor.writerow([f"{country}X", country, country, country])
+
+    ruta = os.path.join(carpeta, "WDI_CSV.zip")
+    with zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("WDICSV.csv", datos.getvalue())
+        zf.writestr("WDICountry.csv", paises.getvalue())
+    return ruta, valores
+
+
+#corre "python -m datos --bulk=WDI_CSV.zip" con la tabla de hechos. Usa su propia
+#carpeta temporal (base, estado, cache y snapshots) para no borrar ni cambiar de
+#esquema la base que miden el --update y las paginas; solo comparte el catalogo
+def medir_bulk(entorno, catalogo, indicadores, anios, repeticiones, workers):
+    carpeta = tempfile.mkdtemp(prefix="proyecto_bulk_")
+    entorno = {
+        **entorno_prueba(carpeta, entorno["PROYECTO_API_URL"]),
+        "PROYECTO_CATALOGO": entorno["PROYECTO_CATALOGO"],
+        "PROYECTO_ESQUEMA": "hechos",
+    }
+    tiempos = []
+    try:
+        ruta, valores = crear_wdi_sintetico(carpeta, list(catalogo["paises"]), indicadores, anios)
+        for _ in range(repeticiones):
+            limpiar(entorno)
+            inicio = time.perf_counter()
+            proceso = subprocess.run(
+                [sys.executable, "-m", "datos", f"--bulk={ruta}", f"--workers={workers}"],
+                cwd=RAIZ, env={**os.environ, **entorno}, capture_output=True, text=True
+            )
+            tiempos.append(time.perf_counter() - inicio)
+            if proceso.returncode != 0:
+                raise RuntimeError(f"--bulk fallo:\n{proceso.stdout}\n{proceso.stderr}")
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    datos = resumen(tiempos)
+    datos["valores"] = valores
+    datos["valores_por_s"] = valores / datos["mediana_s"]
+    return datos
+
+
+#mide cuantos registros por segundo parsea get_indicator (sin red)
+def medir_parseo(catalogo, anios, repeticiones):
+    from datos import ingesta as pf
+
+    countries = list(catalogo["paises"])
+    indicator = catalogo["indicadores"][0]["codigo"]
+    registros = registros_sinteticos(countries, indicator, anios)
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        pf.parsear_registros(registros, countries, "valor")
+        tiempos.append(time.perf_counter() - inicio)
+
+    datos = resumen(tiempos)
+    datos["registros"] = len(registros)
+    datos["registros_por_s"] = len(registros) / datos["mediana_s"]
+    return datos
+
+
+# modulos que el actualizador no debe importar al arrancar. pyarrow no va aqui:
+# pandas 3 lo importa solo si esta instalado y eso no depende de datos.ingesta
+PROHIBIDOS_AL_IMPORTAR = ("streamlit", "plotly", "requests")
+
+
+#importa el modulo en un python nuevo con -X importtime y regresa el tiempo
+#acumulado (ms) y los paquetes de primer nivel que se importaron
+def tiempo_importacion(modulo):
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    acumulado, paquetes = 0, set()
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        partes = [p.strip() for p in linea[len("import time:"):].split("|")]
+        if not partes[1].isdigit():
+            continue  # encabezado
+        paquetes.add(partes[2].split(".")[0])
+        if partes[2] == modulo:
+            acumulado = int(partes[1]) / 1000
+    return acumulado, paquetes
+
+
+#mide la importacion del actualizador (mediana de varias corridas) y revisa que
+#no cargue streamlit, plotly ni requests
+def medir_importacion(repeticiones, presupuesto_ms):
+    tiempos = []
+    for _ in range(repeticiones):
+        ms, paquetes = tiempo_importacion("datos.ingesta")
+        tiempos.append(ms)
+    mediana = statistics.median(tiempos)
+    prohibidos = sorted(p for p in PROHIBIDOS_AL_IMPORTAR if p in paquetes)
+
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "datos", "--help"], cwd=RAIZ, capture_output=True, check=True)
+    ayuda = time.perf_counter() - inicio
+
+    return {
+        "import_datos_ingesta_ms": mediana,
+        "presupuesto_ms": presupuesto_ms,
+        "importados_prohibidos": prohibidos,
+        "cli_ayuda_s": ayuda,
+        "dentro_del_presupuesto": mediana <= presupuesto_ms and not prohibidos,
+    }
+
+
+#primer render (cache vacio) y rerun (cache lleno) de cada pagina
+def medir_paginas(repeticiones):
+    from streamlit.testing.v1 import AppTest
+
+    resultados = {}
+    for ruta in sorted(glob.glob(os.path.join(RAIZ, "pages", "*.py"))):
+        nombre = os.path.basename(ruta)
+        at = AppTest.from_file(ruta, default_timeout=300)
+
+        inicio = time.perf_counter()
+        at.run()
+        primer = time.perf_counter() - inicio
+
+        reruns = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            at.run()
+            reruns.append(time.perf_counter() - inicio)
+
+        resultados[nombre] = {
+            "primer_render_s": primer,
+            "rerun": resumen(reruns),
+            "errores": [str(e.value) for e in at.exception],
+        }
+    return resultados
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "sin-commit"
+
+
+#recorre dos resultados y muestra las metricas que terminan en _s o _por_s
+def comparar(anterior, actual, prefijo=""):
+    for clave, valor in actual.items():
+        if isinstance(valor, dict) and isinstance(anterior.get(clave), dict):
+            comparar(anterior[clave], valor, f"{prefijo}{clave}.")
+        elif isinstance(valor, (int, float)) and isinstance(anterior.get(clave), (int, float)) \
+                and (clave.endswith("_s") or clave.endswith("_por_s")) and anterior[clave]:
+            cambio = (valor - anterior[clave]) / anterior[clave] * 100
+            print(f"{prefijo + clave:<40}{anterior[clave]:>12.4f}{valor:>12.4f}{cambio:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline y del dashboard")
+    parser.add_argument("--anios", type=int, default=60, help="años por serie sintetica")
+    parser.add_argument("--paises-extra", type=int, default=0, help="paises sinteticos ademas del catalogo")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--sin-paginas", action="store_true", help="no medir las paginas de Streamlit")
+    parser.add_argument("--bulk-indicadores", type=int, default=0,
+                        help="indicadores del WDI sintetico para medir la carga masiva (0 = no medir)")
+    # el import (casi todo pandas y sqlalchemy) tarda 0.5-0.7 s, 800 ms deja poco margen
+    # para que una dependencia nueva pesada si se note
+    parser.add_argument("--presupuesto-import-ms", type=float, default=800,
+                        help="tiempo maximo de 'import datos.ingesta' en ms")
+    parser.add_argument("--solo-importacion", action="store_true",
+                        help="solo medir la importacion del actualizador (rapido, para CI)")
+    parser.add_argument("--salida", help="archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de un commit anterior para comparar")
+    args = parser.parse_args()
+
+    if args.solo_importacion:
+        importacion = medir_importacion(args.repeticiones, args.presupuesto_import_ms)
+        print(json.dumps(importacion, indent=2))
+        sys.exit(0 if importacion["dentro_del_presupuesto"] else 1)
+
+    carpeta = tempfile.mkdtemp(prefix="proyecto_bench_")
+    servidor = crear_servidor(args.anios)
+    entorno = entorno_prueba(carpeta, f"http://127.0.0.1:{servidor.server_port}/v2")
+    catalogo = crear_catalogo(entorno["PROYECTO_CATALOGO"], args.paises_extra)
+
+    # el parseo y las paginas corren en este proceso, tienen que ver la misma configuracion
+    os.environ.update(entorno)
+    sys.path.insert(0, RAIZ)
+
+    try:
+        resultados = {
+            "commit": commit_actual(),
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "parametros": vars(args),
+            "importacion": medir_importacion(args.repeticiones, args.presupuesto_import_ms),
+            "update": medir_update(entorno, args.repeticiones, args.workers),
+            "parseo": medir_parseo(catalogo, args.anios, args.repeticiones),
+        }
+        if args.bulk_indicadores:
+            resultados["bulk"] = medir_bulk(entorno, catalogo, args.bulk_indicadores, args.anios,
+                                            args.repeticiones, args.workers)
+        if not args.sin_paginas:
+            resultados["paginas"] = medir_paginas(args.repeticiones)
+    finally:
+        servidor.shutdown()
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    salida = args.salida or os.path.join(RAIZ, "benchmarks", "resultados", f"{resultados['commit']}.json")
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\n{'metrica':<40}{'antes':>12}{'ahora':>12}{'cambio':>10}")
+        comparar(anterior, resultados)
+
+    if not resultados["importacion"]["dentro_del_presupuesto"]:
+        print(f"\nEl import del actualizador se paso del presupuesto: {resultados['importacion']}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
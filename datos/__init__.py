@@ -0,0 +1,5 @@
+#paquete de datos del proyecto:
+#  datos.ingesta -> actualizacion (--update, --watch, --bulk), sin streamlit ni plotly
+#  datos.lectura -> lectura con cache para el dashboard (importa streamlit)
+#  python -m datos -> linea de comandos del actualizador
+#Aqui no se importa nada para que "import datos.ingesta" no cargue tambien la lectura
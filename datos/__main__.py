@@ -0,0 +1,83 @@
+#linea de comandos del actualizador, no importa streamlit ni plotly:
+#
+#  py -m datos --update [--incremental] [--force] [--offline] [--workers=N]
+#  py -m datos --watch --intervalo=3600
+#  py -m datos --bulk=WDI_CSV.zip
+#
+#Tambien se llega aqui con "py Proyecto_Final.py --update ...". Regresa 1 si
+#alguna serie termino con error, para que el cron lo note
+import argparse
+import sys
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="python -m datos", description="Actualizador de indicadores")
+    parser.add_argument("--update", action="store_true",
+                        help="actualizar las series pendientes (es lo que se hace si no se indica otro modo)")
+    parser.add_argument("--watch", action="store_true", help="quedarse corriendo y actualizar cada --intervalo")
+    parser.add_argument("--bulk", metavar="RUTA_O_URL", help="carga masiva del WDI completo (WDI_CSV.zip o WDICSV.csv)")
+    parser.add_argument("--incremental", action="store_true", help="pedir solo los años recientes y hacer upsert")
+    parser.add_argument("--force", action="store_true", help="actualizar todo el catalogo aunque no le toque")
+    parser.add_argument("--offline", action="store_true", help="reconstruir la base solo con el cache de respuestas")
+    parser.add_argument("--workers", type=int, help="series en paralelo (PROYECTO_WORKERS)")
+    parser.add_argument("--backend", choices=["mssql", "sqlite", "duckdb"], help="base de datos (PROYECTO_BACKEND)")
+    parser.add_argument("--intervalo", type=int, help="segundos entre vueltas de --watch (PROYECTO_INTERVALO)")
+    parser.add_argument("--reporte", help="archivo JSON del reporte de metricas")
+    parser.add_argument("--prometheus", help="archivo .prom para el textfile collector")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+
+    # pandas y sqlalchemy se importan hasta aqui, --help no los necesita
+    from datos import ingesta
+
+    if args.backend:
+        ingesta.BACKEND = args.backend
+    # antes de crear la sesion http, su pool de conexiones usa MAX_WORKERS
+    if args.workers:
+        ingesta.MAX_WORKERS = args.workers
+    workers = ingesta.MAX_WORKERS
+
+    if args.bulk:
+        ingesta.carga_masiva(args.bulk, workers=workers)
+        return 0
+
+    print("actualizando...")
+    incremental = args.incremental
+
+    # --offline reconstruye la base solo con las respuestas guardadas,
+    # las ventanas incrementales cambian la URL y no estarian en el cache
+    if args.offline:
+        ingesta.OFFLINE = True
+        incremental = False
+        print("modo offline: usando solo el cache de respuestas")
+
+    opciones = {
+        "workers": workers,
+        "incremental": incremental,
+        "reporte": args.reporte,
+        "prometheus": args.prometheus,
+    }
+
+    if args.watch:
+        try:
+            ingesta.vigilar(args.intervalo or ingesta.INTERVALO_WATCH, **opciones)
+        except KeyboardInterrupt:
+            print("\nmodo watch detenido")
+        return 0
+
+    # solo se actualizan las series que ya les toca segun su cadencia,
+    # --force (o --offline) actualiza todo el catalogo
+    series = ingesta.series_pendientes(forzar=args.force or args.offline)
+    if not series:
+        print("No hay series pendientes, todas estan al dia")
+        return 0
+
+    resultados = ingesta.actualizar_todo(series, **opciones)
+    return 1 if any(r.startswith("error") for r in resultados.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1734 @@
+#actualizacion de los indicadores: descarga del api del Banco Mundial, escritura
+#en la base (SQL Server, SQLite o DuckDB), KPIs, snapshots y carga masiva del WDI.
+#No importa streamlit ni plotly, y requests y pyarrow se importan hasta que se
+#usan, asi el --update, el cron y el Launcher arrancan rapido
+import pandas as pd
+import numpy as np
+from sqlalchemy import create_engine, event, inspect, text, Float, Integer, String
+from sqlalchemy.exc import DBAPIError
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import os
+import random
+import sys
+import threading
+import time
+import hashlib
+import json
+import shutil
+import zipfile
+
+try:
+    import orjson  # mas rapido que json para decodificar las respuestas del api
+    cargar_json = orjson.loads
+except ImportError:
+    cargar_json = json.loads
+
+# carpeta del proyecto, ahi quedan por defecto la base local, el cache y los archivos de estado
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# numero maximo de series que se descargan y guardan al mismo tiempo,
+# se puede cambiar con --workers=N o con la variable PROYECTO_WORKERS
+MAX_WORKERS = int(os.environ.get("PROYECTO_WORKERS", 8))
+
+# una sola sesion http para toda la actualizacion, asi se reutilizan
+# las conexiones keep-alive al api del Banco Mundial. Se crea en sesion()
+SESSION = None
+
+# configuracion del pool de conexiones a SQL Server, se puede cambiar con
+# variables de entorno sin tocar el codigo
+POOL_SIZE = int(os.environ.get("PROYECTO_POOL_SIZE", 5))
+POOL_MAX_OVERFLOW = int(os.environ.get("PROYECTO_POOL_MAX_OVERFLOW", 10))
+POOL_RECYCLE = int(os.environ.get("PROYECTO_POOL_RECYCLE", 1800))
+POOL_PRE_PING = os.environ.get("PROYECTO_POOL_PRE_PING", "1") != "0"
+
+# archivo con la "version de datos", el --update lo reescribe al terminar y
+# el dashboard lo usa para saber cuando tiene que volver a leer de SQL
+VERSION_FILE = os.environ.get(
+    "PROYECTO_VERSION_FILE",
+    os.path.join(RAIZ, "data_version.txt")
+)
+
+# forma de guardar los datos en SQL Server:
+#   "tablas" -> una tabla por pais e indicador (MX_FP_CPI_TOTL_ZG, ...)
+#   "hechos" -> una sola tabla larga (pais, indicador, anio, valor) con llave
+#               primaria clustered y tablas de dimensiones de paises e indicadores
+ESQUEMA = os.environ.get("PROYECTO_ESQUEMA", "tablas")
+TABLA_HECHOS = "hechos_indicadores"
+
+# renglones por lote en las escrituras masivas
+BULK_CHUNK = int(os.environ.get("PROYECTO_BULK_CHUNK", 10000))
+
+# SQL Server acepta maximo 2100 parametros por sentencia, se usa para
+# calcular el tamaño de lote de los INSERT de varios renglones
+MAX_PARAMETROS_SQL = 2000
+
+# carpeta de snapshots Arrow que publica el --update, una subcarpeta por version
+# de datos y un archivo por indicador. Se conservan las ultimas SNAPSHOTS_A_GUARDAR
+SNAPSHOT_DIR = os.environ.get(
+    "PROYECTO_SNAPSHOTS",
+    os.path.join(RAIZ, "snapshots")
+)
+SNAPSHOTS_A_GUARDAR = 3
+
+# base de datos donde se guardan los indicadores: "mssql" (SQL Server, la de
+# siempre), "sqlite" o "duckdb" (archivos locales, no necesitan servidor y sirven
+# para Linux, pruebas y benchmarks). Tambien se puede elegir con --backend=...
+# DuckDB solo deja abrir el archivo a un proceso: sirve para pruebas y benchmarks,
+# no para actualizar con el dashboard abierto (eso necesita mssql o sqlite)
+BACKEND = os.environ.get("PROYECTO_BACKEND", "mssql")
+SQLITE_FILE = os.environ.get(
+    "PROYECTO_SQLITE",
+    os.path.join(RAIZ, "proyecto.db")
+)
+DUCKDB_FILE = os.environ.get(
+    "PROYECTO_DUCKDB",
+    os.path.join(RAIZ, "proyecto.duckdb")
+)
+
+# tablas derivadas que el --update materializa para el dashboard: los KPIs de cada
+# serie y el PIB/Desempleo ya unidos por año (los paises que tienen los dos)
+TABLA_KPIS = "kpis_indicadores"
+TABLA_PIB_DESEMPLEO = "pib_desempleo"
+PIB, DESEMPLEO = "NY.GDP.MKTP.KD.ZG", "SL.UEM.TOTL.ZS"
+
+# engine unico para todo el proceso, lo comparten el --update y todas las
+# sesiones de Streamlit (los modulos importados viven una sola vez por proceso)
+_engine = None
+_engine_lock = threading.Lock()
+
+
+#cadena de conexion y opciones del engine de cada backend
+def conexion_mssql():
+    server = r"Usuario\SQLEXPRESS"
+    database = "Proyecto"
+    driver = "ODBC+Driver+17+for+SQL+Server"
+
+    cadena = f"mssql+pyodbc://@{server}/{database}?driver={driver}&trusted_connection=yes"
+
+    return cadena, {
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+        "fast_executemany": True,
+    }
+
+
+def conexion_sqlite():
+    return f"sqlite:///{SQLITE_FILE}", {"connect_args": {"timeout": 30}}
+
+
+def conexion_duckdb():
+    # necesita el paquete duckdb_engine
+    return f"duckdb:///{DUCKDB_FILE}", {}
+
+
+#pysqlite no emite BEGIN antes de DDL (DROP TABLE, ALTER TABLE ... RENAME), cada
+#sentencia se confirma sola y una publicacion cortada a la mitad quedaria a medias.
+#Receta de SQLAlchemy: el driver deja de manejar transacciones y el BEGIN se manda
+#en el evento "begin", asi todo lo que va en engine.begin() es una sola transaccion.
+#Con WAL los lectores siguen viendo la version anterior mientras se publica
+def preparar_sqlite(engine):
+    @event.listens_for(engine, "connect")
+    def al_conectar(dbapi_con, registro):
+        dbapi_con.isolation_level = None
+        dbapi_con.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def al_empezar(con):
+        con.exec_driver_sql("BEGIN")
+
+
+# todo lo que cambia de una base a otra esta aqui, el resto del codigo solo
+# pregunta a backend():
+#   conexion     -> funcion que regresa la cadena y las opciones del engine
+#   escritores   -> cuantos hilos pueden escribir a la vez (None = sin limite)
+#   carga_rapida -> escribir con fast_executemany y tabla de carga de respaldo
+#   merge        -> la base tiene MERGE (si no, DELETE + INSERT)
+#   crear_tabla  -> CREATE TABLE que no falla si la tabla ya existe
+#   renombrar    -> sentencia para que una tabla de carga tome el lugar de la final
+#   clustered    -> tipo de llave primaria de la tabla de hechos
+#   preparar     -> funcion que ajusta el engine recien creado (o None)
+#   sin_bloqueos -> revisar READ_COMMITTED_SNAPSHOT (sin el, los lectores esperan a los MERGE)
+BACKENDS = {
+    "mssql": {
+        "conexion": conexion_mssql,
+        "escritores": None,
+        "carga_rapida": True,
+        "merge": True,
+        "crear_tabla": "IF OBJECT_ID('{nombre}') IS NULL CREATE TABLE {nombre} ({columnas})",
+        "renombrar": "EXEC sp_rename '{stage}', '{tabla}'",
+        "clustered": "CLUSTERED",
+        "preparar": None,
+        "sin_bloqueos": True,
+    },
+    # SQLite y DuckDB son un solo archivo y aceptan un escritor a la vez
+    "sqlite": {
+        "conexion": conexion_sqlite,
+        "escritores": 1,
+        "carga_rapida": False,
+        "merge": False,
+        "crear_tabla": "CREATE TABLE IF NOT EXISTS {nombre} ({columnas})",
+        "renombrar": 'ALTER TABLE "{stage}" RENAME TO "{tabla}"',
+        "clustered": "",
+        "preparar": preparar_sqlite,
+        "sin_bloqueos": False,
+    },
+    # DuckDB hace transaccional el DDL, pero el archivo lo tiene un solo proceso:
+    # si el dashboard (otro proceso) lo tiene abierto el --update falla con
+    # "Could not set lock on file". Solo para un proceso a la vez (pruebas, benchmarks)
+    "duckdb": {
+        "conexion": conexion_duckdb,
+        "escritores": 1,
+        "carga_rapida": False,
+        "merge": False,
+        "crear_tabla": "CREATE TABLE IF NOT EXISTS {nombre} ({columnas})",
+        "renombrar": 'ALTER TABLE "{stage}" RENAME TO "{tabla}"',
+        "clustered": "",
+        "preparar": None,
+        "sin_bloqueos": False,
+    },
+}
+
+
+#configuracion del BACKEND elegido (se lee cada vez porque --backend lo cambia al arrancar)
+def backend():
+    if BACKEND not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {BACKEND} (use {', '.join(BACKENDS)})")
+    return BACKENDS[BACKEND]
+
+
+#cadena de conexion y opciones del engine segun el BACKEND elegido
+def configuracion_backend():
+    return backend()["conexion"]()
+
+
+#cuantos hilos escriben en la base: los que se pidieron, pero nunca mas de los
+#que acepta el backend
+def limite_escritores(workers):
+    maximo = backend()["escritores"]
+    return workers if maximo is None else min(workers, maximo)
+
+
+#sesion http compartida, la primera vez importa requests y la crea con un pool
+#de MAX_WORKERS conexiones. Se monta una sola vez, asi el modo --watch conserva
+#las conexiones keep-alive de una vuelta a otra
+def sesion():
+    global SESSION
+
+    if SESSION is None:
+        with _engine_lock:
+            if SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                nueva = requests.Session()
+                adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+                nueva.mount("https://", adapter)
+                nueva.mount("http://", adapter)
+                SESSION = nueva
+
+    return SESSION
+
+
+#conexion a la base de datos, la primera vez crea el engine con su pool y despues
+#siempre regresa el mismo. Para usarlo: "with conectar().connect() as con"
+#o "with conectar().begin() as con", asi la conexion regresa al pool al terminar
+def conectar():
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                cadena, opciones = configuracion_backend()
+                nuevo = create_engine(cadena, **opciones)
+                if backend()["preparar"]:
+                    backend()["preparar"](nuevo)
+                _engine = nuevo
+
+    return _engine
+
+
+#escribe un DataFrame en SQL lo mas rapido posible. En SQL Server primero intenta
+#con fast_executemany (arreglos de parametros tipados, por lotes de BULK_CHUNK);
+#si el driver falla, carga una tabla temporal con INSERT de varios renglones
+#y pasa todo a la tabla final con un solo INSERT ... SELECT.
+#SQLite y DuckDB son locales, ahi basta con to_sql por lotes
+def escribir_bulk(con, df, table_name, dtype=None, if_exists="append"):
+    if not backend()["carga_rapida"]:
+        df.to_sql(table_name, con, if_exists=if_exists, index=False,
+                  dtype=dtype, chunksize=BULK_CHUNK)
+        return
+
+    try:
+        with con.begin_nested():
+            df.to_sql(table_name, con, if_exists=if_exists, index=False,
+                      dtype=dtype, chunksize=BULK_CHUNK)
+        return
+    except DBAPIError as e:
+        print(f" fast_executemany fallo en {table_name}, usando tabla de carga: {e.orig}")
+
+    stage = f"{table_name}_carga"
+    df.head(0).to_sql(table_name, con, if_exists=if_exists, index=False, dtype=dtype)
+    df.to_sql(stage, con, if_exists="replace", index=False, dtype=dtype,
+              method="multi", chunksize=max(1, MAX_PARAMETROS_SQL // len(df.columns)))
+
+    columnas = ", ".join(f'"{c}"' for c in df.columns)
+    con.execute(text(f"INSERT INTO {table_name} ({columnas}) SELECT {columnas} FROM {stage}"))
+    con.execute(text(f"DROP TABLE {stage}"))
+
+
+# flotante de 64 bits en todas las bases (FLOAT(53) / DOUBLE PRECISION). El FLOAT
+# de DuckDB es de 32 bits: 14.871 quedaria como 14.871000289916992 y el hash de los
+# renglones nunca coincidiria con lo que trae el api
+DOBLE = Float(precision=53)
+
+
+#tipos de SQL de las tablas por serie (date, columna)
+def tipos_serie(column_name):
+    return {"date": Integer(), column_name: DOBLE}
+
+
+# tipos de SQL de la tabla de hechos
+TIPOS_HECHOS = {"indicador": String(64), "pais": String(3), "anio": Integer(), "valor": DOBLE}
+
+
+# direccion del api del Banco Mundial, se puede cambiar para usar un servidor
+# de prueba (por ejemplo el de benchmarks/benchmark.py)
+API_URL = os.environ.get("PROYECTO_API_URL", "https://api.worldbank.org/v2")
+
+# cuantos paises se piden juntos en una sola llamada al api (MX;US;CA;...)
+# y cuantos registros por pagina. Cada pagina se pasa a columnas en cuanto
+# llega, asi que la memoria maxima depende de POR_PAGINA y no del total
+PAISES_POR_PETICION = 60
+POR_PAGINA = int(os.environ.get("PROYECTO_POR_PAGINA", 20000))
+
+
+# en modo incremental se vuelven a pedir los ultimos años antes de MAX(date)
+# porque el Banco Mundial suele revisar los valores recientes
+VENTANA_REVISION = 5
+
+
+# carpeta donde se guardan las respuestas del api (cuerpo + ETag/Last-Modified)
+HTTP_CACHE_DIR = os.environ.get(
+    "PROYECTO_HTTP_CACHE",
+    os.path.join(RAIZ, "cache_http")
+)
+
+# con --offline no se hace ninguna peticion, todo sale de HTTP_CACHE_DIR
+OFFLINE = False
+
+# tiempo maximo (segundos) para conectar y para esperar cada lectura del api,
+# asi un socket colgado no detiene toda la actualizacion
+TIMEOUT_CONEXION = float(os.environ.get("PROYECTO_TIMEOUT_CONEXION", 5))
+TIMEOUT_LECTURA = float(os.environ.get("PROYECTO_TIMEOUT_LECTURA", 60))
+
+# reintentos de las respuestas 429/5xx y errores de red, con espera exponencial
+# (BACKOFF_BASE, 2x, 4x, ... hasta BACKOFF_MAX) y un poco de azar para que los
+# hilos no reintenten todos al mismo tiempo
+REINTENTOS = int(os.environ.get("PROYECTO_REINTENTOS", 4))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# limite de peticiones por segundo (token bucket). La tasa baja a la mitad con
+# cada 429/5xx o si la latencia pasa de LATENCIA_OBJETIVO, y sube poco a poco
+# mientras el api contesta bien, entre TASA_MIN y TASA_MAX
+TASA_MAX = float(os.environ.get("PROYECTO_TASA_MAX", 10))
+TASA_MIN = 0.5
+LATENCIA_OBJETIVO = 5
+_limite = {"tasa": TASA_MAX, "tokens": TASA_MAX, "ultimo": time.monotonic()}
+_limite_lock = threading.Lock()
+
+# circuit breaker: despues de FALLAS_CIRCUITO fallas seguidas el circuito se abre y
+# no se llama al api durante PAUSA_CIRCUITO segundos. Al terminar la pausa pasa a
+# "medio abierto": una sola peticion de prueba sale y los demas hilos siguen sin
+# llamar; si la prueba sale bien se cierra, si falla se vuelve a abrir otra pausa
+FALLAS_CIRCUITO = 5
+PAUSA_CIRCUITO = 60
+_circuito = {"estado": "cerrado", "fallas": 0, "abierto_hasta": 0.0, "prueba_desde": 0.0}
+
+
+# metricas de la actualizacion en curso, por indicador (descargas) y por
+# serie (parseo y escritura). Las llenan los hilos del pool, por eso el lock
+_metricas = {"indicadores": {}, "series": {}}
+_metricas_lock = threading.Lock()
+
+# archivo del reporte JSON que deja cada --update
+REPORTE_FILE = os.environ.get(
+    "PROYECTO_REPORTE",
+    os.path.join(RAIZ, "reporte_update.json")
+)
+
+
+#suma valores a las metricas de un indicador o de una serie,
+#ej. sumar_metrica("indicadores", "FP.CPI.TOTL.ZG", http_s=0.4, bytes=1200)
+def sumar_metrica(seccion, llave, **valores):
+    if llave is None:
+        return
+    with _metricas_lock:
+        actual = _metricas[seccion].setdefault(llave, {})
+        for nombre, valor in valores.items():
+            actual[nombre] = actual.get(nombre, 0) + valor
+
+
+def reiniciar_metricas():
+    with _metricas_lock:
+        _metricas["indicadores"].clear()
+        _metricas["series"].clear()
+
+
+#escribe el reporte JSON de la corrida y, si se pide, el archivo .prom para el
+#textfile collector de node exporter (se escribe a un temporal y se renombra)
+def exportar_metricas(resultados, duracion, ruta_json=None, ruta_prometheus=None):
+    with _metricas_lock:
+        reporte = {
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duracion_s": duracion,
+            "indicadores": {k: dict(v) for k, v in _metricas["indicadores"].items()},
+            "series": {k: dict(v) for k, v in _metricas["series"].items()},
+        }
+    for (country, indicator, _), resultado in resultados.items():
+        reporte["series"].setdefault(llave_serie(country, indicator), {})["resultado"] = resultado
+
+    ruta_json = ruta_json or REPORTE_FILE
+    with open(ruta_json, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    print(f"Reporte de la actualizacion: {ruta_json}")
+
+    if not ruta_prometheus:
+        return reporte
+
+    lineas = [
+        "# HELP proyecto_update_duracion_seconds Duracion total del --update",
+        "# TYPE proyecto_update_duracion_seconds gauge",
+        f"proyecto_update_duracion_seconds {duracion:.6f}",
+        "# HELP proyecto_update_timestamp_seconds Hora en que termino el --update",
+        "# TYPE proyecto_update_timestamp_seconds gauge",
+        f"proyecto_update_timestamp_seconds {time.time():.0f}",
+    ]
+    # todas son gauges con el valor de la ultima corrida (se reinician en cada --update),
+    # por eso ninguna lleva el sufijo _total que en Prometheus es de los counters
+    metricas_indicador = {
+        "peticiones": ("proyecto_update_peticiones", "Peticiones al api por indicador"),
+        "http_s": ("proyecto_update_http_seconds", "Tiempo esperando al api por indicador"),
+        "bytes": ("proyecto_update_descarga_bytes", "Bytes descargados por indicador"),
+        "reintentos": ("proyecto_update_reintentos", "Peticiones fallidas (429/5xx/red) por indicador"),
+        "json_s": ("proyecto_update_json_seconds", "Tiempo decodificando JSON por indicador"),
+        "parseo_s": ("proyecto_update_parseo_seconds", "Tiempo armando DataFrames por indicador"),
+    }
+    metricas_serie = {
+        "filas_parseadas": ("proyecto_update_filas_parseadas", "Renglones parseados por serie"),
+        "filas_escritas": ("proyecto_update_filas_escritas", "Renglones escritos en la base por serie"),
+        "escritura_s": ("proyecto_update_escritura_seconds", "Tiempo de escritura en la base por serie"),
+    }
+    for campo, (nombre, ayuda) in metricas_indicador.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+        for indicator, valores in reporte["indicadores"].items():
+            lineas.append(f'{nombre}{{indicador="{indicator}"}} {valores.get(campo, 0)}')
+    for campo, (nombre, ayuda) in metricas_serie.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+        for llave, valores in reporte["series"].items():
+            country, indicator = llave.split("|")
+            lineas.append(f'{nombre}{{pais="{country}",indicador="{indicator}"}} {valores.get(campo, 0)}')
+    lineas += ["# HELP proyecto_update_serie_ok 1 si la serie se guardo bien",
+               "# TYPE proyecto_update_serie_ok gauge"]
+    for llave, valores in reporte["series"].items():
+        country, indicator = llave.split("|")
+        ok = 1 if valores.get("resultado") in ("ok", "sin cambios") else 0
+        lineas.append(f'proyecto_update_serie_ok{{pais="{country}",indicador="{indicator}"}} {ok}')
+
+    temporal = f"{ruta_prometheus}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write("\n".join(lineas) + "\n")
+    os.replace(temporal, ruta_prometheus)
+    print(f"Metricas Prometheus: {ruta_prometheus}")
+    return reporte
+
+
+#ruta del archivo de cache de una URL (la URL completa con parametros)
+def ruta_cache(url_completa):
+    nombre = hashlib.sha1(url_completa.encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, f"{nombre}.json")
+
+
+#lee la respuesta guardada de una URL o None si no esta en el cache
+def leer_cache_http(url_completa):
+    try:
+        with open(ruta_cache(url_completa), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+#guarda la respuesta en el cache, primero en un archivo temporal y luego se
+#renombra para que otro hilo nunca lea un archivo a medias
+def guardar_cache_http(url_completa, r):
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    ruta = ruta_cache(url_completa)
+    temporal = f"{ruta}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({
+            "url": url_completa,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "body": r.text,
+        }, f)
+    os.replace(temporal, ruta)
+
+
+#espera hasta que el token bucket tenga un turno libre
+def esperar_turno():
+    while True:
+        with _limite_lock:
+            ahora = time.monotonic()
+            _limite["tokens"] = min(max(1, _limite["tasa"]),
+                                    _limite["tokens"] + (ahora - _limite["ultimo"]) * _limite["tasa"])
+            _limite["ultimo"] = ahora
+            if _limite["tokens"] >= 1:
+                _limite["tokens"] -= 1
+                return
+            espera = (1 - _limite["tokens"]) / _limite["tasa"]
+        time.sleep(espera)
+
+
+#abre el circuito por PAUSA_CIRCUITO segundos, se llama con _limite_lock tomado
+def abrir_circuito(motivo):
+    _circuito["estado"] = "abierto"
+    _circuito["abierto_hasta"] = time.monotonic() + PAUSA_CIRCUITO
+    print(f"[WARN] {motivo}, pausa de {PAUSA_CIRCUITO} s")
+
+
+#ajusta la tasa segun la respuesta (aumento aditivo, disminucion multiplicativa)
+#y mueve el circuit breaker. prueba=True si esta fue la peticion de prueba del
+#estado medio abierto; las respuestas que llegan tarde de peticiones que salieron
+#antes de abrir el circuito no lo cierran ni lo vuelven a abrir
+def registrar_respuesta(ok, latencia, prueba=False):
+    with _limite_lock:
+        if ok and latencia <= LATENCIA_OBJETIVO:
+            _limite["tasa"] = min(TASA_MAX, _limite["tasa"] + 0.5)
+        else:
+            _limite["tasa"] = max(TASA_MIN, _limite["tasa"] / 2)
+            _limite["tokens"] = min(_limite["tokens"], _limite["tasa"])
+
+        if prueba:
+            if ok:
+                _circuito["estado"], _circuito["fallas"] = "cerrado", 0
+                print("el api volvio a responder, circuito cerrado")
+            else:
+                abrir_circuito("la peticion de prueba fallo")
+        elif _circuito["estado"] == "cerrado":
+            if ok:
+                _circuito["fallas"] = 0
+            else:
+                _circuito["fallas"] += 1
+                if _circuito["fallas"] >= FALLAS_CIRCUITO:
+                    abrir_circuito(f"el api fallo {FALLAS_CIRCUITO} veces seguidas")
+
+
+#decide si este hilo puede llamar al api: regresa "normal" con el circuito
+#cerrado, "prueba" si le toco la unica peticion de prueba del estado medio
+#abierto, o None si hay que esperar. Si la prueba no reporto nada despues de los
+#timeouts (el hilo murio) se deja salir otra
+def turno_circuito():
+    with _limite_lock:
+        ahora = time.monotonic()
+        if _circuito["estado"] == "cerrado":
+            return "normal"
+        if _circuito["estado"] == "abierto" and ahora < _circuito["abierto_hasta"]:
+            return None
+        if _circuito["estado"] == "medio" and \
+                ahora - _circuito["prueba_desde"] < TIMEOUT_CONEXION + TIMEOUT_LECTURA:
+            return None
+        _circuito["estado"], _circuito["prueba_desde"] = "medio", ahora
+        return "prueba"
+
+
+#espera antes del reintento n: exponencial con azar ("full jitter"). Si el api
+#manda Retry-After se respeta
+def espera_reintento(intento, r=None):
+    if r is not None and r.headers.get("Retry-After", "").isdigit():
+        return min(BACKOFF_MAX, int(r.headers["Retry-After"]))
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento))
+
+
+#GET con timeouts, limite de tasa, reintentos y circuit breaker. Regresa la
+#respuesta (200, 304 o un error que no vale la pena reintentar como 404)
+#o None si despues de los reintentos el api no contesto
+def get_con_reintentos(url_completa, headers, etiqueta=None):
+    import requests
+
+    for intento in range(REINTENTOS + 1):
+        turno = turno_circuito()
+        if turno is None:
+            sumar_metrica("indicadores", etiqueta, circuito_abierto=1)
+            return None
+
+        esperar_turno()
+        inicio = time.perf_counter()
+        try:
+            r = sesion().get(url_completa, headers=headers, timeout=(TIMEOUT_CONEXION, TIMEOUT_LECTURA))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            r, error = None, type(e).__name__
+        else:
+            error = r.status_code if r.status_code == 429 or r.status_code >= 500 else None
+        latencia = time.perf_counter() - inicio
+
+        sumar_metrica("indicadores", etiqueta, peticiones=1, http_s=latencia,
+                      bytes=len(r.content) if r is not None else 0)
+        registrar_respuesta(error is None, latencia, prueba=turno == "prueba")
+        if error is None:
+            return r
+
+        sumar_metrica("indicadores", etiqueta, reintentos=1)
+        if intento < REINTENTOS:
+            espera = espera_reintento(intento, r)
+            print(f" {etiqueta}: {error}, reintento {intento + 1} de {REINTENTOS} en {espera:.1f} s")
+            time.sleep(espera)
+    return None
+
+
+#hace un GET al api usando el cache en disco. Si ya tenemos la respuesta se
+#manda If-None-Match / If-Modified-Since y un 304 reutiliza el cuerpo guardado.
+#En modo OFFLINE solo se usa el cache. Regresa el JSON o None si no hubo respuesta.
+#etiqueta (el indicador) es para las metricas de la actualizacion
+def pedir_json(url, params, etiqueta=None):
+    import requests
+
+    url_completa = requests.Request("GET", url, params=params).prepare().url
+    guardado = leer_cache_http(url_completa)
+
+    if OFFLINE:
+        sumar_metrica("indicadores", etiqueta, desde_cache=1)
+        return cargar_json(guardado["body"]) if guardado else None
+
+    headers = {}
+    if guardado and guardado.get("etag"):
+        headers["If-None-Match"] = guardado["etag"]
+    if guardado and guardado.get("last_modified"):
+        headers["If-Modified-Since"] = guardado["last_modified"]
+
+    r = get_con_reintentos(url_completa, headers, etiqueta)
+    if r is None:
+        sumar_metrica("indicadores", etiqueta, errores_http=1)
+        return None
+
+    if r.status_code == 304 and guardado:
+        sumar_metrica("indicadores", etiqueta, no_modificadas=1)
+        return cargar_json(guardado["body"])
+    if r.status_code != 200:
+        sumar_metrica("indicadores", etiqueta, errores_http=1)
+        return None
+
+    guardar_cache_http(url_completa, r)
+    inicio = time.perf_counter()
+    data = cargar_json(r.content)
+    sumar_metrica("indicadores", etiqueta, json_s=time.perf_counter() - inicio)
+    return data
+
+
+#hace la peticion al api y sigue todas las paginas que indica data[0]["pages"].
+#Cada pagina se convierte a columnas (registros_a_columnas) en cuanto llega y el
+#JSON se descarta, regresa la lista de bloques o None si el api no respondio.
+#fechas es opcional y limita los años con el formato del api "YYYY:YYYY"
+def descargar_paginas(url, fechas=None, etiqueta=None):
+    bloques = []
+    pagina = 1
+    paginas = 1
+
+    while pagina <= paginas:
+        params = {"format": "json", "per_page": POR_PAGINA, "page": pagina}
+        if fechas:
+            params["date"] = fechas
+        data = pedir_json(url, params, etiqueta)
+        if data is None:
+            return None
+
+        if len(data) < 2 or data[1] is None:
+            break
+
+        paginas = int(data[0].get("pages", 1))
+        inicio = time.perf_counter()
+        bloques.append(registros_a_columnas(data[1]))
+        sumar_metrica("indicadores", etiqueta, parseo_s=time.perf_counter() - inicio,
+                      registros=len(data[1]))
+        del data
+        pagina += 1
+
+    return bloques
+
+
+#pasa los registros de una pagina del api a columnas tipadas (pais, date, valor)
+#y quita los nulos con una mascara de numpy en lugar de revisar uno por uno
+def registros_a_columnas(registros):
+    valores = np.array([item["value"] for item in registros], dtype=float)
+    validos = ~np.isnan(valores)
+
+    return pd.DataFrame({
+        "pais": np.array([item["country"]["id"] for item in registros], dtype=object)[validos],
+        "date": np.array([item["date"] for item in registros], dtype=str)[validos].astype(np.int64),
+        "valor": valores[validos],
+    })
+
+
+#junta los bloques de columnas y los separa en un DataFrame (date, name)
+#por pais, ordenado por año. Los paises sin datos quedan con un DataFrame vacio
+def separar_por_pais(bloques, countries, name):
+    resultado = {country: pd.DataFrame() for country in countries}
+    if not bloques:
+        return resultado
+
+    todo = pd.concat(bloques, ignore_index=True)
+    todo = todo[todo["pais"].isin(resultado)]
+
+    for country, grupo in todo.groupby("pais", sort=False):
+        resultado[country] = (
+            grupo.drop(columns="pais")
+            .rename(columns={"valor": name})
+            .sort_values("date", ignore_index=True)
+        )
+    return resultado
+
+
+#limpia los registros del api (quita los nulos) y los separa en un
+#DataFrame (date, name) por pais, ordenado por año
+def parsear_registros(registros, countries, name):
+    return separar_por_pais([registros_a_columnas(registros)], countries, name)
+
+
+#igual que get_indicator pero para muchos paises a la vez, los agrupa de
+#PAISES_POR_PETICION en PAISES_POR_PETICION en la URL, limpia los nulos
+#y separa el resultado en un DataFrame por pais
+def get_indicator_batch(countries, indicator, name, fechas=None):
+    countries = list(countries)
+    bloques = []
+
+    for i in range(0, len(countries), PAISES_POR_PETICION):
+        grupo = countries[i:i + PAISES_POR_PETICION]
+        url = f"{API_URL}/country/{';'.join(grupo)}/indicator/{indicator}"
+        paginas = descargar_paginas(url, fechas, indicator)
+        if paginas is None:
+            # sin esto los paises del grupo quedarian como "sin datos" en silencio
+            raise RuntimeError(f"el api no respondio para {indicator} ({';'.join(grupo)})")
+        bloques.extend(paginas)
+
+    inicio = time.perf_counter()
+    resultado = separar_por_pais(bloques, countries, name)
+    sumar_metrica("indicadores", indicator, parseo_s=time.perf_counter() - inicio)
+    for country, df in resultado.items():
+        sumar_metrica("series", llave_serie(country, indicator), filas_parseadas=len(df))
+    return resultado
+
+
+#esta funcion construye la URL, hace peticion http, verifica que la api respondio,
+#Convierte la respuesta en JSON, de ahi limpia los datos porque la api da varios nulos
+#y devuelve el dataframe ya limpio
+def get_indicator(country, indicator, name, fechas=None):
+    return get_indicator_batch([country], indicator, name, fechas)[country]
+
+
+#nombre de la tabla de SQL para un pais e indicador, ej. MX_FP_CPI_TOTL_ZG
+def nombre_tabla(country, indicator):
+    return f"{country}_{indicator}".replace(".", "_")
+
+
+# marca de "todavia no se consulta el ultimo año", None ya significa que la serie no existe
+SIN_LEER = object()
+
+
+#regresa el ultimo año guardado de la serie o None si todavia no existe
+def leer_ultimo_anio(country, indicator):
+    with conectar().connect() as con:
+        if ESQUEMA == "hechos":
+            return con.execute(
+                text(f"SELECT MAX(anio) FROM {TABLA_HECHOS} WHERE indicador = :i AND pais = :p"),
+                {"i": indicator, "p": country}
+            ).scalar()
+
+        table_name = nombre_tabla(country, indicator)
+        if not inspect(con).has_table(table_name):
+            return None
+        return con.execute(text(f'SELECT MAX("date") FROM {table_name}')).scalar()
+
+
+#crea una tabla si no existe, SQL Server no tiene CREATE TABLE IF NOT EXISTS
+def crear_tabla(con, nombre, columnas):
+    con.execute(text(backend()["crear_tabla"].format(nombre=nombre, columnas=columnas)))
+
+
+#crea (si no existen) la tabla de hechos y las dimensiones. La llave primaria
+#va por indicador, pais y año (clustered en SQL Server) para que una pagina que
+#compara paises lea un solo rango del indice. Agregar un pais nuevo solo inserta renglones
+def crear_esquema_hechos():
+    clustered = backend()["clustered"]
+    with conectar().begin() as con:
+        crear_tabla(con, "dim_pais", """
+            pais VARCHAR(3) NOT NULL PRIMARY KEY
+        """)
+        crear_tabla(con, "dim_indicador", """
+            indicador VARCHAR(64) NOT NULL PRIMARY KEY,
+            columna NVARCHAR(64) NOT NULL
+        """)
+        crear_tabla(con, TABLA_HECHOS, f"""
+            indicador VARCHAR(64) NOT NULL REFERENCES dim_indicador (indicador),
+            pais VARCHAR(3) NOT NULL REFERENCES dim_pais (pais),
+            anio SMALLINT NOT NULL,
+            valor DOUBLE PRECISION NOT NULL,
+            CONSTRAINT PK_{TABLA_HECHOS} PRIMARY KEY {clustered} (indicador, pais, anio)
+        """)
+
+
+#da de alta en las dimensiones los paises e indicadores de las series
+def registrar_dimensiones(series):
+    with conectar().begin() as con:
+        for country in sorted({country for country, _, _ in series}):
+            con.execute(text("""
+                INSERT INTO dim_pais (pais) SELECT :p
+                WHERE NOT EXISTS (SELECT 1 FROM dim_pais WHERE pais = :p)
+            """), {"p": country})
+        for indicator, column_name in sorted({(i, c) for _, i, c in series}):
+            # corrige la columna si se dio de alta con otro nombre (p.ej. una carga masiva vieja)
+            con.execute(text("""
+                UPDATE dim_indicador SET columna = :c WHERE indicador = :i AND columna <> :c
+            """), {"i": indicator, "c": column_name})
+            con.execute(text("""
+                INSERT INTO dim_indicador (indicador, columna) SELECT :i, :c
+                WHERE NOT EXISTS (SELECT 1 FROM dim_indicador WHERE indicador = :i)
+            """), {"i": indicator, "c": column_name})
+
+
+#pasa los renglones de la tabla stage a la tabla final: actualiza los que ya
+#existen (mismas llaves) e inserta los nuevos. En SQL Server es un MERGE, en
+#SQLite y DuckDB un DELETE + INSERT dentro de la misma transaccion
+def merge_desde_stage(con, table_name, stage, llaves, valores):
+    comillas = lambda c: f'"{c}"'
+    on = " AND ".join(f"t.{comillas(c)} = s.{comillas(c)}" for c in llaves)
+    todas = ", ".join(comillas(c) for c in llaves + valores)
+
+    if backend()["merge"]:
+        con.execute(text(f"""
+            MERGE {table_name} AS t
+            USING {stage} AS s ON {on}
+            WHEN MATCHED THEN UPDATE SET {", ".join(f"t.{comillas(c)} = s.{comillas(c)}" for c in valores)}
+            WHEN NOT MATCHED THEN INSERT ({todas})
+                VALUES ({", ".join(f"s.{comillas(c)}" for c in llaves + valores)});
+        """))
+    else:
+        donde = " AND ".join(f"{table_name}.{comillas(c)} = s.{comillas(c)}" for c in llaves)
+        con.execute(text(f"""
+            DELETE FROM {table_name}
+            WHERE EXISTS (SELECT 1 FROM {stage} AS s WHERE {donde})
+        """))
+        con.execute(text(f"INSERT INTO {table_name} ({todas}) SELECT {todas} FROM {stage}"))
+
+
+#pasa el DataFrame (date, columna) al formato de la tabla de hechos
+def a_formato_hechos(country, indicator, column_name, df):
+    return pd.DataFrame({
+        "indicador": indicator,
+        "pais": country,
+        "anio": df["date"].astype(int),
+        "valor": df[column_name].astype(float),
+    })
+
+
+#calcula un hash por renglon (año + valor) para saber que renglones cambiaron
+def hash_filas(df, column_name):
+    serie = df.set_index("date")[column_name].astype(float)
+    return pd.util.hash_pandas_object(serie, index=True)
+
+
+#compara lo que trae el api contra lo que ya esta en la tabla (desde el primer
+#año descargado) y deja en una tabla de carga solo los renglones nuevos o revisados.
+#Regresa cuantos renglones cambiaron y la operacion que los publica (o None)
+def upsert_indicator(table_name, column_name, df):
+    with conectar().begin() as con:
+        actual = pd.read_sql(
+            text(f'SELECT "date", "{column_name}" FROM {table_name} WHERE "date" >= :desde'),
+            con, params={"desde": int(df["date"].min())}
+        )
+
+        nuevos = hash_filas(df, column_name)
+        viejos = hash_filas(actual, column_name)
+        cambiados = nuevos.index[nuevos.ne(viejos.reindex(nuevos.index))]
+        cambios = df[df["date"].isin(cambiados)]
+
+        if cambios.empty:
+            return 0, None
+
+        stage = f"{table_name}_stage"
+        escribir_bulk(con, cambios, stage, tipos_serie(column_name), if_exists="replace")
+        return len(cambios), ("merge", table_name, stage, ["date"], [column_name])
+
+
+#lo mismo que upsert_indicator pero sobre la tabla de hechos
+def upsert_hechos(country, indicator, column_name, df):
+    with conectar().begin() as con:
+        actual = pd.read_sql(
+            text(f"""
+                SELECT anio AS "date", valor AS "{column_name}" FROM {TABLA_HECHOS}
+                WHERE indicador = :i AND pais = :p AND anio >= :desde
+            """),
+            con, params={"i": indicator, "p": country, "desde": int(df["date"].min())}
+        )
+
+        nuevos = hash_filas(df, column_name)
+        viejos = hash_filas(actual, column_name)
+        cambiados = nuevos.index[nuevos.ne(viejos.reindex(nuevos.index))]
+        cambios = a_formato_hechos(country, indicator, column_name, df[df["date"].isin(cambiados)])
+
+        if cambios.empty:
+            return 0, None
+
+        stage = f"{nombre_tabla(country, indicator)}_stage"
+        escribir_bulk(con, cambios, stage, TIPOS_HECHOS, if_exists="replace")
+        return len(cambios), ("merge", TABLA_HECHOS, stage, ["indicador", "pais", "anio"], ["valor"])
+
+
+#carga la serie completa en una tabla aparte, al publicar reemplaza todos los
+#renglones de la serie en la tabla de hechos
+def guardar_hechos(country, indicator, column_name, df):
+    stage = f"{nombre_tabla(country, indicator)}_nuevo"
+    with conectar().begin() as con:
+        escribir_bulk(con, a_formato_hechos(country, indicator, column_name, df),
+                      stage, TIPOS_HECHOS, if_exists="replace")
+    return ("reemplazar_serie", stage, indicator, country)
+
+
+# True cuando ya se reviso READ_COMMITTED_SNAPSHOT en este proceso
+_sin_bloqueos = {"listo": False}
+
+
+#En SQL Server el DELETE + INSERT de la tabla de hechos y el MERGE toman locks de
+#renglon que con el READ COMMITTED normal hacen esperar al dashboard hasta que
+#termina la publicacion. Con READ_COMMITTED_SNAPSHOT esas lecturas ven la ultima
+#version confirmada sin esperar. No ayuda con DROP TABLE ni sp_rename (esquema
+#"tablas"): esos toman un lock de esquema y los lectores de esa tabla esperan
+#hasta el COMMIT, que es corto porque los datos ya estan cargados en la tabla de
+#carga. El --update no cambia la configuracion de la base, solo avisa una vez
+def lecturas_sin_bloqueo():
+    if not backend()["sin_bloqueos"] or _sin_bloqueos["listo"]:
+        return
+    _sin_bloqueos["listo"] = True
+    try:
+        with conectar().connect() as con:
+            activo = con.execute(text(
+                "SELECT is_read_committed_snapshot_on FROM sys.databases WHERE name = DB_NAME()"
+            )).scalar()
+    except DBAPIError as e:
+        print(f"[WARN] no se pudo revisar READ_COMMITTED_SNAPSHOT: {e.orig}")
+        return
+    if not activo:
+        print("[WARN] READ_COMMITTED_SNAPSHOT esta apagado: el dashboard espera mientras se publica. "
+              "Para evitarlo un DBA puede ejecutar: ALTER DATABASE Proyecto SET READ_COMMITTED_SNAPSHOT ON")
+
+
+#publica en una sola transaccion todo lo que se dejo en tablas de carga:
+#  ("renombrar", tabla, stage)              -> la tabla nueva toma el lugar de la vieja
+#  ("merge", tabla, stage, llaves, valores) -> upsert de los renglones que cambiaron
+#  ("reemplazar_serie", stage, indicador, pais) -> serie completa en la tabla de hechos
+#Mientras se llenan las tablas de carga el dashboard sigue leyendo las anteriores, y
+#al final ve todas las series de la corrida nuevas o ninguna. Solo la publicacion
+#(unos renombres o MERGE de datos ya cargados) puede hacerlo esperar un momento en
+#SQL Server, ver lecturas_sin_bloqueo; en SQLite (WAL) no espera
+def publicar_cargas(operaciones):
+    if not operaciones:
+        return
+    lecturas_sin_bloqueo()
+    with conectar().begin() as con:
+        for op in operaciones:
+            if op[0] == "renombrar":
+                _, table_name, stage = op
+                if inspect(con).has_table(table_name):
+                    con.execute(text(f'DROP TABLE "{table_name}"'))
+                con.execute(text(backend()["renombrar"].format(stage=stage, tabla=table_name)))
+            elif op[0] == "merge":
+                _, table_name, stage, llaves, valores = op
+                merge_desde_stage(con, table_name, stage, llaves, valores)
+                con.execute(text(f"DROP TABLE {stage}"))
+            else:
+                _, stage, indicator, country = op
+                columnas = ", ".join(TIPOS_HECHOS)
+                con.execute(
+                    text(f"DELETE FROM {TABLA_HECHOS} WHERE indicador = :i AND pais = :p"),
+                    {"i": indicator, "p": country}
+                )
+                con.execute(text(f"INSERT INTO {TABLA_HECHOS} ({columnas}) SELECT {columnas} FROM {stage}"))
+                con.execute(text(f"DROP TABLE {stage}"))
+    print(f"Publicadas {len(operaciones)} tablas de carga")
+
+
+#llama a la funcion get_indicator() para obtener limpio el DataFrame,
+#si viene vacio muestra error, conecta a SQL Server, construye el nombre de la tabla,
+#guarda el DataFrame en SQL ya listo para que podamos usarlo en las visualizaciones
+#regresa True si la tabla se guardo, asi el resumen sabe que series fallaron.
+#Si ya se descargo el DataFrame (por ejemplo con get_indicator_batch) se puede pasar en df.
+#Con incremental=True y la tabla ya existente solo se hace upsert de los renglones que cambiaron.
+#Los datos se escriben primero en tablas de carga; si se pasa la lista pendientes la
+#operacion de publicar se agrega ahi (actualizar_todo publica todas juntas al final),
+#si no se publica en ese momento.
+#ultimo es el MAX(date) de la serie si quien llama ya lo leyo (None si la tabla no existe),
+#asi no se vuelve a consultar
+def save_indicator_to_sql(country, indicator, column_name, df=None, incremental=False, pendientes=None,
+                          ultimo=SIN_LEER):
+    table_name = nombre_tabla(country, indicator)
+
+    if incremental and ultimo is SIN_LEER:
+        ultimo = leer_ultimo_anio(country, indicator)
+
+    if df is None:
+        fechas = None
+        if incremental and ultimo is not None:
+            fechas = f"{int(ultimo) - VENTANA_REVISION}:{pd.Timestamp.now().year}"
+        df = get_indicator(country, indicator, column_name, fechas)
+
+    if df.empty:
+        print(f" No se pudo obtener {indicator} de {country}")
+        return False
+
+    existe = incremental and ultimo is not None
+    inicio = time.perf_counter()
+
+    if ESQUEMA == "hechos":
+        if existe:
+            escritos, op = upsert_hechos(country, indicator, column_name, df)
+        else:
+            op = guardar_hechos(country, indicator, column_name, df)
+            escritos = len(df)
+        print(f"Serie cargada: {table_name} ({escritos} renglones)")
+    elif existe:
+        escritos, op = upsert_indicator(table_name, column_name, df)
+        print(f"Tabla cargada: {table_name} ({escritos} renglones)")
+    else:
+        stage = f"{table_name}_nuevo"
+        with conectar().begin() as con:
+            escribir_bulk(con, df, stage, tipos_serie(column_name), if_exists="replace")
+        op = ("renombrar", table_name, stage)
+        escritos = len(df)
+        print(f"Tabla cargada: {table_name} ({escritos} renglones)")
+
+    if op is not None:
+        if pendientes is None:
+            publicar_cargas([op])
+        else:
+            pendientes.append(op)
+
+    sumar_metrica("series", llave_serie(country, indicator),
+                  filas_escritas=escritos, escritura_s=time.perf_counter() - inicio)
+    return True
+
+
+#KPIs de una serie (DataFrame con date y la columna del indicador): ultimo dato,
+#variacion contra el año anterior, promedios de 5, 10 y todos los años, maximo
+#y tendencia (promedio de las ultimas 3 variaciones). Lo usa el --update y
+#tambien las paginas cuando el slider no cubre todos los años
+def calcular_kpis(country, indicator, df, column_name):
+    serie = df.sort_values("date")
+    anios = serie["date"].to_numpy()
+    valores = serie[column_name].to_numpy(dtype=float)
+    cambios = np.diff(valores)
+    penultimo = valores[-2] if len(valores) >= 2 else np.nan
+
+    return {
+        "pais": country,
+        "indicador": indicator,
+        "ultimo_anio": int(anios[-1]),
+        "ultimo_valor": valores[-1],
+        "penultimo_valor": penultimo,
+        "variacion": valores[-1] - penultimo,
+        "promedio_5": valores[-5:].mean(),
+        "promedio_10": valores[-10:].mean(),
+        "promedio_total": valores.mean(),
+        "maximo_valor": valores.max(),
+        "maximo_anio": int(anios[valores.argmax()]),
+        "tendencia_3": cambios[-3:].mean() if len(cambios) else np.nan,
+    }
+
+
+#crea las tablas derivadas si no existen
+def crear_tablas_derivadas(con):
+    crear_tabla(con, TABLA_KPIS, """
+        pais VARCHAR(3) NOT NULL,
+        indicador VARCHAR(64) NOT NULL,
+        ultimo_anio INTEGER NOT NULL,
+        ultimo_valor DOUBLE PRECISION NOT NULL,
+        penultimo_valor DOUBLE PRECISION,
+        variacion DOUBLE PRECISION,
+        promedio_5 DOUBLE PRECISION NOT NULL,
+        promedio_10 DOUBLE PRECISION NOT NULL,
+        promedio_total DOUBLE PRECISION NOT NULL,
+        maximo_valor DOUBLE PRECISION NOT NULL,
+        maximo_anio INTEGER NOT NULL,
+        tendencia_3 DOUBLE PRECISION,
+        PRIMARY KEY (pais, indicador)
+    """)
+    crear_tabla(con, TABLA_PIB_DESEMPLEO, f"""
+        pais VARCHAR(3) NOT NULL,
+        "date" INTEGER NOT NULL,
+        "{COLUMNAS[PIB]}" DOUBLE PRECISION NOT NULL,
+        "{COLUMNAS[DESEMPLEO]}" DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (pais, "date")
+    """)
+
+
+#recalcula las tablas derivadas solo para las series que cambiaron en esta
+#corrida (y las que todavia no tienen KPIs, por ejemplo la primera vez)
+def materializar_agregados(cambiadas):
+    with conectar().begin() as con:
+        crear_tablas_derivadas(con)
+        existentes = set(con.execute(text(f"SELECT pais, indicador FROM {TABLA_KPIS}")).fetchall())
+
+    cambiadas = set(cambiadas)
+    pendientes = [(c, i, col) for c, i, col in SERIES
+                  if (c, i, col) in cambiadas or (c, i) not in existentes]
+
+    filas = []
+    for country, indicator, column_name in pendientes:
+        try:
+            df = consultar_tabla(nombre_tabla(country, indicator))
+        except Exception:
+            continue  # la serie todavia no tiene datos
+        if not df.empty:
+            filas.append(calcular_kpis(country, indicator, df, column_name))
+
+    # paises con PIB y Desempleo donde alguno de los dos cambio
+    con_ambos = {c for c, i, _ in SERIES if i == DESEMPLEO} & {c for c, i, _ in SERIES if i == PIB}
+    combinar = sorted({c for c, i, _ in pendientes if i in (PIB, DESEMPLEO)} & con_ambos)
+
+    with conectar().begin() as con:
+        if filas:
+            kpis = pd.DataFrame(filas)
+            stage = f"{TABLA_KPIS}_stage"
+            escribir_bulk(con, kpis, stage, if_exists="replace")
+            merge_desde_stage(con, TABLA_KPIS, stage, ["pais", "indicador"],
+                              [c for c in kpis.columns if c not in ("pais", "indicador")])
+            con.execute(text(f"DROP TABLE {stage}"))
+
+        for country in combinar:
+            unido = pd.merge(
+                consultar_tabla(nombre_tabla(country, PIB)),
+                consultar_tabla(nombre_tabla(country, DESEMPLEO)),
+                on="date", how="inner"
+            ).sort_values("date")
+            con.execute(text(f"DELETE FROM {TABLA_PIB_DESEMPLEO} WHERE pais = :p"), {"p": country})
+            escribir_bulk(con, unido.assign(pais=country), TABLA_PIB_DESEMPLEO)
+
+    print(f"KPIs recalculados: {len(filas)} series, PIB/Desempleo: {len(combinar)} paises")
+
+
+# catalogo de paises e indicadores (con su columna, cadencia y prioridad),
+# para agregar series solo hay que editar este archivo
+CATALOGO_FILE = os.environ.get(
+    "PROYECTO_CATALOGO",
+    os.path.join(RAIZ, "catalogo.json")
+)
+
+# archivo donde se guarda cuando se actualizo cada serie por ultima vez
+ESTADO_FILE = os.environ.get(
+    "PROYECTO_ESTADO",
+    os.path.join(RAIZ, "estado_actualizacion.json")
+)
+
+_catalogo = None
+
+
+#lee el catalogo una sola vez por proceso
+def cargar_catalogo():
+    global _catalogo
+    if _catalogo is None:
+        with open(CATALOGO_FILE, encoding="utf-8") as f:
+            _catalogo = json.load(f)
+    return _catalogo
+
+
+#expande el catalogo en la lista de series (pais, indicador, columna)
+#ordenada por prioridad del indicador (1 = primero)
+def expandir_catalogo(catalogo):
+    series = []
+    for ind in sorted(catalogo["indicadores"], key=lambda ind: ind.get("prioridad", 99)):
+        paises = ind.get("paises", "todos")
+        if paises == "todos":
+            paises = list(catalogo["paises"])
+        for country in paises:
+            series.append((country, ind["codigo"], ind["columna"]))
+    return series
+
+
+# diccionario codigo -> nombre de los paises, lo usan las paginas
+PAISES = cargar_catalogo()["paises"]
+
+# todas las series (pais, indicador, columna) que se actualizan con --update
+SERIES = expandir_catalogo(cargar_catalogo())
+
+
+#llave de una serie en el archivo de estado, ej. "MX|FP.CPI.TOTL.ZG"
+def llave_serie(country, indicator):
+    return f"{country}|{indicator}"
+
+
+def leer_estado():
+    try:
+        with open(ESTADO_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+#guarda la hora de actualizacion de las series que salieron bien (o que no
+#cambiaron) y el hash del contenido que se escribio de cada una
+def registrar_actualizacion(resultados, contenido=None):
+    estado = leer_estado()
+    hashes = estado.setdefault("hashes", {})
+    ahora = time.time()
+    for serie, resultado in resultados.items():
+        country, indicator, _ = serie
+        if resultado in ("ok", "sin cambios"):
+            estado[llave_serie(country, indicator)] = ahora
+        if resultado == "ok" and contenido and serie in contenido:
+            hashes[llave_serie(country, indicator)] = contenido[serie]
+    with open(ESTADO_FILE, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2)
+
+
+#arma la cola de trabajo: solo las series cuya cadencia ya se cumplio
+#(o todas con forzar=True), en el orden de prioridad del catalogo
+def series_pendientes(forzar=False):
+    if forzar:
+        return list(SERIES)
+
+    cadencias = {ind["codigo"]: ind.get("cadencia_dias", 1) for ind in cargar_catalogo()["indicadores"]}
+    estado = leer_estado()
+    ahora = time.time()
+
+    pendientes = []
+    for country, indicator, column_name in SERIES:
+        ultima = estado.get(llave_serie(country, indicator), 0)
+        if ahora - ultima >= cadencias[indicator] * 86400:
+            pendientes.append((country, indicator, column_name))
+    return pendientes
+
+
+#huella del contenido descargado de una serie: primer año y hash de los renglones.
+#Si es igual a la de la ultima escritura la serie no cambio
+def hash_contenido(df, column_name):
+    filas = hash_filas(df.sort_values("date"), column_name)
+    return {"desde": int(df["date"].min()), "hash": hashlib.sha256(filas.to_numpy().tobytes()).hexdigest()}
+
+
+#lee una opcion de la consola con la forma --nombre=valor,
+#si no viene regresa el valor por defecto
+def leer_opcion(nombre, default=None):
+    prefijo = f"--{nombre}="
+    for arg in sys.argv:
+        if arg.startswith(prefijo):
+            return arg[len(prefijo):]
+    return default
+
+
+#descarga y guarda todas las series en paralelo con un pool de hilos,
+#cada hilo usa la misma sesion http. Primero se descarga cada indicador
+#para todos sus paises en una sola peticion (get_indicator_batch) y despues
+#se guarda cada pais en su tabla. Al final imprime un resumen
+#con las series que se guardaron y las que fallaron.
+#Con incremental=True solo se piden los años recientes de las tablas que ya
+#existen y se hace upsert de los renglones que cambiaron.
+#Al final escribe el reporte de metricas (JSON y opcionalmente Prometheus).
+#progreso(hechas, total) se llama cada vez que termina una serie (lo usa el Launcher)
+def actualizar_todo(series=SERIES, workers=MAX_WORKERS, incremental=False,
+                    reporte=None, prometheus=None, progreso=None):
+    inicio = time.perf_counter()
+    reiniciar_metricas()
+
+    if ESQUEMA == "hechos":
+        crear_esquema_hechos()
+        registrar_dimensiones(series)
+
+    # agrupamos los paises por indicador y por ventana de años a pedir,
+    # las tablas nuevas se piden completas (fechas=None)
+    # el ultimo año de cada serie se lee una sola vez y se reutiliza abajo
+    grupos = {}
+    ultimos = {}
+    hoy = pd.Timestamp.now().year
+    for country, indicator, column_name in series:
+        fechas = None
+        if incremental:
+            ultimo = ultimos[(country, indicator, column_name)] = leer_ultimo_anio(country, indicator)
+            if ultimo is not None:
+                fechas = int(ultimo) - VENTANA_REVISION
+        grupos.setdefault((indicator, column_name, fechas is not None), []).append((country, fechas))
+
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        descargas = {}
+        for (indicator, column_name, reciente), paises in grupos.items():
+            countries = [country for country, _ in paises]
+            fechas = f"{min(f for _, f in paises)}:{hoy}" if reciente else None
+            futuro = pool.submit(get_indicator_batch, countries, indicator, column_name, fechas)
+            descargas[futuro] = (indicator, column_name, countries)
+
+        frames = {}
+        for futuro in as_completed(descargas):
+            indicator, column_name, countries = descargas[futuro]
+            try:
+                for country, df in futuro.result().items():
+                    frames[(country, indicator, column_name)] = df
+            except Exception as e:
+                for country in countries:
+                    resultados[(country, indicator, column_name)] = f"error: {e}"
+
+        # las series que trajeron exactamente lo mismo que la ultima vez (y que
+        # siguen en la base) no se vuelven a escribir
+        hashes = leer_estado().get("hashes", {})
+        contenido = {}
+        for serie, df in list(frames.items()):
+            country, indicator, column_name = serie
+            if df.empty:
+                continue
+            contenido[serie] = hash_contenido(df, column_name)
+            if hashes.get(llave_serie(country, indicator)) != contenido[serie]:
+                continue
+            if serie not in ultimos:
+                ultimos[serie] = leer_ultimo_anio(country, indicator)
+            if ultimos[serie] is not None:
+                resultados[serie] = "sin cambios"
+                del frames[serie]
+
+    # las descargas usan todos los workers, las escrituras solo los que acepta
+    # el backend (uno en SQLite y DuckDB, igual que la carga masiva)
+    pendientes = []
+    with ThreadPoolExecutor(max_workers=limite_escritores(workers)) as escritura:
+        futuros = {
+            escritura.submit(save_indicator_to_sql, *serie, df=df, incremental=incremental,
+                             pendientes=pendientes, ultimo=ultimos.get(serie, SIN_LEER)): serie
+            for serie, df in frames.items()
+        }
+        for futuro in as_completed(futuros):
+            serie = futuros[futuro]
+            try:
+                resultados[serie] = "ok" if futuro.result() else "sin datos"
+            except Exception as e:
+                resultados[serie] = f"error: {e}"
+            if progreso:
+                progreso(len(resultados), len(series))
+
+    # todas las series de la corrida se publican juntas, si falla no se publica ninguna
+    try:
+        publicar_cargas(pendientes)
+    except Exception as e:
+        for serie, resultado in resultados.items():
+            if resultado == "ok":
+                resultados[serie] = f"error al publicar: {e}"
+
+    # solo las series donde se escribio algo necesitan KPIs nuevos, y si no
+    # cambio nada se queda la version publicada (los caches del dashboard siguen validos).
+    # Si los KPIs o el snapshot fallan esas series quedan con error: no se guarda su
+    # hash, asi la siguiente corrida las vuelve a escribir y publica la version
+    with _metricas_lock:
+        cambiadas = [serie for serie, r in resultados.items() if r == "ok" and
+                     _metricas["series"].get(llave_serie(*serie[:2]), {}).get("filas_escritas", 0)]
+    try:
+        if cambiadas:
+            materializar_agregados(cambiadas)
+            print(f"Version de datos: {publicar_version_datos()}")
+        else:
+            print("No cambio ningun dato, se conserva la version publicada")
+    except Exception as e:
+        print(f"[WARN] no se pudo publicar la version de datos: {e}")
+        for serie in cambiadas:
+            resultados[serie] = f"error al publicar: {e}"
+
+    print("\n           RESUMEN")
+    for serie in series:
+        country, indicator, _ = serie
+        print(f"{country:<4}{indicator:<22}{resultados[serie]}")
+
+    exitos = sum(1 for r in resultados.values() if r == "ok")
+    iguales = sum(1 for r in resultados.values() if r == "sin cambios")
+    print(f"\n{exitos} de {len(series)} series actualizadas, {iguales} sin cambios")
+
+    # los hashes se guardan hasta que la version ya quedo publicada
+    registrar_actualizacion(resultados, contenido)
+
+    exportar_metricas(resultados, time.perf_counter() - inicio, reporte, prometheus)
+    return resultados
+
+
+# cada cuantos segundos revisa el modo --watch si ya le toca a alguna serie
+INTERVALO_WATCH = int(os.environ.get("PROYECTO_INTERVALO", 3600))
+
+
+#modo --watch: se queda corriendo y en cada vuelta actualiza las series que ya
+#les toca segun su cadencia. Las que no cambiaron no se escriben y solo se publica
+#version nueva si algo cambio. Un error en una vuelta no detiene el proceso
+def vigilar(intervalo=INTERVALO_WATCH, **opciones):
+    print(f"modo watch: revisando cada {intervalo} s (Ctrl+C para salir)")
+    while True:
+        try:
+            series = series_pendientes()
+            if series:
+                actualizar_todo(series, **opciones)
+            else:
+                print(f"{time.strftime('%H:%M:%S')} no hay series pendientes")
+        except Exception as e:
+            print(f"[WARN] la actualizacion fallo, se reintenta en la siguiente vuelta: {e}")
+        time.sleep(intervalo)
+
+
+# carga masiva del World Development Indicators completo (WDI_CSV.zip del Banco
+# Mundial, ~1,500 indicadores x ~265 economias). Se lee por bloques de BULK_FILAS
+# renglones del CSV (cada renglon es un pais-indicador con una columna por año)
+WDI_BULK_URL = "https://databank.worldbank.org/data/download/WDI_CSV.zip"
+BULK_FILAS = int(os.environ.get("PROYECTO_BULK_FILAS", 5000))
+
+# archivo con los bloques ya cargados, si la carga se interrumpe se continua
+# desde ahi con el mismo archivo de origen
+BULK_CHECKPOINT = os.environ.get(
+    "PROYECTO_BULK_CHECKPOINT",
+    os.path.join(RAIZ, "bulk_checkpoint.json")
+)
+
+
+#descarga el zip del WDI a HTTP_CACHE_DIR por partes de 1 MB. Si una descarga
+#anterior se corto se continua con un Range desde lo que ya se tenia.
+#El ETag/Last-Modified se guarda en <zip>.json (describe el .part mientras exista,
+#si no el zip completo): con el zip ya descargado se pregunta con If-None-Match y
+#solo se vuelve a bajar si el servidor no contesta 304. En modo OFFLINE se usa lo que haya
+def descargar_bulk(url):
+    import requests
+
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    ruta = os.path.join(HTTP_CACHE_DIR, os.path.basename(url.split("?")[0]) or "wdi_bulk.zip")
+    if OFFLINE:
+        if os.path.exists(ruta):
+            return ruta
+        raise FileNotFoundError(f"Modo offline y {ruta} no esta descargado")
+
+    parcial = f"{ruta}.part"
+    validadores = f"{ruta}.json"
+    try:
+        with open(validadores, encoding="utf-8") as f:
+            guardado = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        guardado = {}
+
+    ya = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    headers = {}
+    if ya:
+        # If-Range: si el archivo cambio el servidor manda todo (200) y no un pedazo del nuevo
+        headers["Range"] = f"bytes={ya}-"
+        if guardado.get("etag") or guardado.get("last_modified"):
+            headers["If-Range"] = guardado.get("etag") or guardado["last_modified"]
+    elif os.path.exists(ruta):
+        if guardado.get("etag"):
+            headers["If-None-Match"] = guardado["etag"]
+        if guardado.get("last_modified"):
+            headers["If-Modified-Since"] = guardado["last_modified"]
+
+    try:
+        r = sesion().get(url, headers=headers, stream=True, timeout=(TIMEOUT_CONEXION, TIMEOUT_LECTURA))
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if os.path.exists(ruta):
+            print(f"No se pudo revisar {url} ({type(e).__name__}), se usa la copia del cache")
+            return ruta
+        raise
+
+    with r:
+        if r.status_code == 304:
+            print(f"{os.path.basename(ruta)} no cambio desde la ultima descarga")
+            return ruta
+        r.raise_for_status()
+        if r.status_code != 206:
+            ya = 0  # no hay .part, el servidor no acepta Range o el archivo cambio
+            with open(validadores, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "etag": r.headers.get("ETag"),
+                           "last_modified": r.headers.get("Last-Modified")}, f)
+        total = ya + int(r.headers.get("Content-Length", 0))
+        aviso = 0
+        with open(parcial, "ab" if ya else "wb") as f:
+            for parte in r.iter_content(1 << 20):
+                f.write(parte)
+                ya += len(parte)
+                if total and ya * 10 // total > aviso:
+                    aviso = ya * 10 // total
+                    print(f" descarga {ya / 1e6:.0f} de {total / 1e6:.0f} MB")
+    os.replace(parcial, ruta)
+    return ruta
+
+
+#abre el CSV de datos (dentro del zip o suelto) en binario y regresa el archivo,
+#su tamaño y el mapa de codigo ISO3 -> ISO2 (de WDICountry.csv, si viene) para
+#que los paises queden con los mismos codigos que usa el api (MEX -> MX)
+def abrir_wdi(ruta):
+    iso2 = {}
+    if zipfile.is_zipfile(ruta):
+        zf = zipfile.ZipFile(ruta)
+        nombres = zf.namelist()
+        datos = next(n for n in nombres if n.endswith(("WDICSV.csv", "WDIData.csv", "Data.csv")))
+        paises = next((n for n in nombres if n.endswith("Country.csv")), None)
+        if paises:
+            with zf.open(paises) as f:
+                iso2 = leer_iso2(f)
+        return zf.open(datos), zf.getinfo(datos).file_size, iso2
+
+    paises = os.path.join(os.path.dirname(ruta), "WDICountry.csv")
+    if os.path.exists(paises):
+        with open(paises, "rb") as f:
+            iso2 = leer_iso2(f)
+    return open(ruta, "rb"), os.path.getsize(ruta), iso2
+
+
+def leer_iso2(f):
+    paises = pd.read_csv(f, usecols=["Country Code", "2-alpha code"], dtype=str,
+                         keep_default_na=False, encoding="utf-8-sig")
+    paises = paises[paises["2-alpha code"].str.len() > 0]
+    return dict(zip(paises["Country Code"], paises["2-alpha code"]))
+
+
+#pasa un bloque del CSV (un renglon por pais-indicador, una columna por año) al
+#formato de la tabla de hechos y quita los vacios con una mascara de numpy
+def wdi_a_hechos(bloque, iso2):
+    anios = [c for c in bloque.columns if str(c).strip().isdigit()]
+    valores = bloque[anios].to_numpy(dtype=float)
+    filas, columnas = np.nonzero(~np.isnan(valores))
+    pais = pd.Series(bloque["Country Code"].to_numpy()[filas])
+    return pd.DataFrame({
+        "indicador": bloque["Indicator Code"].to_numpy()[filas],
+        "pais": pais.map(iso2).fillna(pais).to_numpy(),
+        "anio": np.array(anios, dtype=int)[columnas],
+        "valor": valores[filas, columnas],
+    })
+
+
+def leer_checkpoint(origen):
+    try:
+        with open(BULK_CHECKPOINT, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return set()
+    # si cambio el archivo de origen los bloques anteriores ya no sirven
+    return set(checkpoint["bloques"]) if checkpoint.get("origen") == origen else set()
+
+
+def guardar_checkpoint(origen, hechos):
+    temporal = f"{BULK_CHECKPOINT}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({"origen": origen, "bloques": sorted(hechos)}, f)
+    os.replace(temporal, BULK_CHECKPOINT)
+
+
+#carga un bloque en su propia tabla de carga y lo pasa a la tabla de hechos con
+#MERGE en la misma transaccion, asi repetir un bloque no duplica renglones
+def cargar_bloque_wdi(numero, df):
+    stage = f"{TABLA_HECHOS}_bulk_{numero}"
+    with conectar().begin() as con:
+        escribir_bulk(con, df, stage, TIPOS_HECHOS, if_exists="replace")
+        merge_desde_stage(con, TABLA_HECHOS, stage, ["indicador", "pais", "anio"], ["valor"])
+        con.execute(text(f"DROP TABLE {stage}"))
+    return len(df)
+
+
+#--bulk=ruta|url: carga el WDI completo en la tabla de hechos. Lee el CSV por
+#bloques (la memoria depende de BULK_FILAS y de los bloques en vuelo, no del
+#tamaño del archivo), los escribe en paralelo y guarda un checkpoint por bloque
+def carga_masiva(origen, workers=MAX_WORKERS):
+    if ESQUEMA != "hechos":
+        raise ValueError("La carga masiva usa la tabla de hechos, ejecute con PROYECTO_ESQUEMA=hechos")
+
+    inicio = time.perf_counter()
+    ruta = descargar_bulk(origen) if origen.startswith(("http://", "https://")) else origen
+    identidad = f"{os.path.abspath(ruta)}|{os.path.getsize(ruta)}|{os.path.getmtime(ruta):.0f}"
+    hechos = leer_checkpoint(identidad)
+    if hechos:
+        print(f"continuando carga masiva, {len(hechos)} bloques ya estaban cargados")
+
+    crear_esquema_hechos()
+    lecturas_sin_bloqueo()
+    workers = limite_escritores(workers)
+    paises_vistos, indicadores_vistos = set(), set()
+    renglones = 0
+
+    archivo, tamanio, iso2 = abrir_wdi(ruta)
+    with archivo, ThreadPoolExecutor(max_workers=workers) as pool:
+        en_vuelo = {}
+        lector = pd.read_csv(archivo, chunksize=BULK_FILAS, encoding="utf-8-sig",
+                             dtype={"Country Code": str, "Indicator Code": str})
+        for numero, bloque in enumerate(lector):
+            if numero in hechos:
+                continue
+            df = wdi_a_hechos(bloque, iso2)
+            if df.empty:
+                hechos.add(numero)
+                continue
+
+            # las dimensiones se dan de alta aqui (un solo hilo) antes de escribir
+            # los indicadores del catalogo llevan su columna, los demas usan el codigo
+            nuevas = [(c, i, COLUMNAS.get(i, i)) for c, i in df[["pais", "indicador"]].drop_duplicates().itertuples(index=False)
+                      if c not in paises_vistos or i not in indicadores_vistos]
+            if nuevas:
+                registrar_dimensiones(nuevas)
+                paises_vistos.update(c for c, _, _ in nuevas)
+                indicadores_vistos.update(i for _, i, _ in nuevas)
+
+            # maximo 2 bloques por hilo en memoria
+            while len(en_vuelo) >= workers * 2:
+                listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    renglones += futuro.result()
+                    hechos.add(en_vuelo.pop(futuro))
+                    guardar_checkpoint(identidad, hechos)
+
+            en_vuelo[pool.submit(cargar_bloque_wdi, numero, df)] = numero
+            transcurrido = time.perf_counter() - inicio
+            print(f"bloque {numero}: {len(df)} renglones, {archivo.tell() / tamanio:.1%} del archivo, "
+                  f"{renglones} cargados ({renglones / transcurrido:.0f} renglones/s)")
+
+        for futuro in as_completed(en_vuelo):
+            renglones += futuro.result()
+            hechos.add(en_vuelo[futuro])
+            guardar_checkpoint(identidad, hechos)
+
+    if os.path.exists(BULK_CHECKPOINT):
+        os.remove(BULK_CHECKPOINT)
+    print(f"\nCarga masiva terminada: {renglones} renglones en {time.perf_counter() - inicio:.1f} s")
+    # la carga reemplaza tambien las series del catalogo, los KPIs y PIB/Desempleo se recalculan
+    # antes de publicar para que la nueva version no los lea desfasados
+    materializar_agregados(SERIES)
+    print(f"Version de datos: {publicar_version_datos()}")
+    return renglones
+
+
+#escribe una nueva version de datos, con eso el cache del dashboard se invalida.
+#Antes de cambiar la version se publica el snapshot Arrow de esa version
+def publicar_version_datos():
+    version = time.strftime("%Y%m%d%H%M%S")
+    publicar_snapshot(version)
+    with open(VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(version)
+    return version
+
+
+#archivo del snapshot de un indicador en una version
+def ruta_snapshot(version, indicator):
+    return os.path.join(SNAPSHOT_DIR, version, f"{indicator.replace('.', '_')}.arrow")
+
+
+#escribe un snapshot inmutable con todas las series del catalogo, un archivo
+#Arrow (IPC sin compresion, se puede leer con memory map) por indicador.
+#Se escribe en una carpeta temporal y se renombra al final
+def publicar_snapshot(version):
+    try:
+        import pyarrow
+    except ImportError:  # sin pyarrow no se publican snapshots y se lee directo de SQL
+        print("pyarrow no esta instalado, no se publica snapshot")
+        return
+
+    temporal = os.path.join(SNAPSHOT_DIR, f"{version}.tmp")
+    os.makedirs(temporal, exist_ok=True)
+
+    for indicator in COLUMNAS:
+        escribir_arrow(temporal, indicator, consultar_indicador(list(PAISES), indicator))
+    for nombre in (TABLA_KPIS, TABLA_PIB_DESEMPLEO):
+        escribir_arrow(temporal, nombre, consultar_derivada(nombre))
+
+    os.replace(temporal, os.path.join(SNAPSHOT_DIR, version))
+
+    # borramos las versiones viejas
+    versiones = sorted(v for v in os.listdir(SNAPSHOT_DIR) if not v.endswith(".tmp"))
+    for vieja in versiones[:-SNAPSHOTS_A_GUARDAR]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, vieja), ignore_errors=True)
+    print(f"Snapshot publicado: {os.path.join(SNAPSHOT_DIR, version)}")
+
+
+#escribe un DataFrame como archivo Arrow dentro de la carpeta del snapshot
+def escribir_arrow(carpeta, nombre, df):
+    import pyarrow as pa
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(os.path.join(carpeta, f"{nombre.replace('.', '_')}.arrow"), "wb") as f:
+        with pa.ipc.new_file(f, tabla.schema) as writer:
+            writer.write_table(tabla)
+
+
+#lee la version de datos actual, es un archivo local asi que no toca la base de datos
+def leer_version_datos():
+    try:
+        with open(VERSION_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+# tabla -> (pais, indicador, columna) e indicador -> columna, salen de SERIES
+TABLAS = {nombre_tabla(country, indicator): (country, indicator, column_name)
+          for country, indicator, column_name in SERIES}
+COLUMNAS = {indicator: column_name for _, indicator, column_name in SERIES}
+
+
+#consulta directo en SQL Server una tabla de una serie (sin cache).
+#Solo acepta tablas del catalogo (TABLAS), el nombre nunca viene del usuario.
+#Con el esquema "hechos" la tabla se arma con un filtro sobre la tabla de hechos
+def consultar_tabla(table_name):
+    if table_name not in TABLAS:
+        raise ValueError(f"Tabla desconocida: {table_name}")
+
+    country, indicator, column_name = TABLAS[table_name]
+    return consultar_indicador([country], indicator).drop(columns="pais")
+
+
+#revisa que el indicador y las columnas pedidas existan, regresa la columna
+#del indicador y la lista de columnas a devolver
+def validar_consulta(indicator, columnas):
+    if indicator not in COLUMNAS:
+        raise ValueError(f"Indicador desconocido: {indicator}")
+    column_name = COLUMNAS[indicator]
+    todas = ["pais", "date", column_name]
+    columnas = list(columnas) if columnas else todas
+    if any(c not in todas for c in columnas):
+        raise ValueError(f"Columnas invalidas: {columnas} (use {todas})")
+    return column_name, columnas
+
+
+#consulta en la base un indicador para varios paises (sin cache) y lo regresa en
+#formato largo con las columnas pais, date y la columna del indicador (o solo
+#las que se pidan en columnas). Los paises van como parametros. Con el esquema
+#"hechos" es una sola consulta sobre el indice, con "tablas" se lee cada tabla
+#(los paises sin tabla se omiten)
+def consultar_indicador(countries, indicator, columnas=None):
+    column_name, columnas = validar_consulta(indicator, columnas)
+    countries = list(countries)
+
+    # sin paises no hay nada que leer (y "pais IN ()" no es SQL valido)
+    if not countries:
+        return pd.DataFrame(columns=columnas)
+
+    if ESQUEMA == "hechos":
+        expresiones = {"pais": "pais", "date": 'anio AS "date"', column_name: f'valor AS "{column_name}"'}
+        parametros = {f"p{n}": country for n, country in enumerate(countries)}
+        with conectar().connect() as con:
+            return pd.read_sql(
+                text(f"""
+                    SELECT {", ".join(expresiones[c] for c in columnas)} FROM {TABLA_HECHOS}
+                    WHERE indicador = :i AND pais IN ({", ".join(":" + p for p in parametros)})
+                    ORDER BY pais, anio
+                """),
+                con, params={"i": indicator, **parametros}
+            )
+
+    frames = []
+    with conectar().connect() as con:
+        for country in countries:
+            table_name = nombre_tabla(country, indicator)
+            if table_name not in TABLAS or not inspect(con).has_table(table_name):
+                continue  # el pais todavia no tiene tabla
+            df = pd.read_sql(text(f'SELECT "date", "{column_name}" FROM "{table_name}" ORDER BY "date"'), con)
+            frames.append(df.assign(pais=country))
+    if not frames:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(frames, ignore_index=True)[columnas]
+
+
+#lee completa una tabla derivada (KPIs o PIB/Desempleo), son tablas chicas
+def consultar_derivada(nombre):
+    with conectar().connect() as con:
+        if not inspect(con).has_table(nombre):
+            return pd.DataFrame()
+        return pd.read_sql(f"SELECT * FROM {nombre}", con)
@@ -0,0 +1,211 @@
+#lectura de los datos para el dashboard: snapshots Arrow con memory map, consultas
+#a la base y el cubo pais x indicador x año. Los snapshots y las tablas derivadas
+#quedan en st.cache_resource con la version de datos como parte de la llave, asi
+#los comparten todas las sesiones; el cubo se va llenando por partes
+import streamlit as st
+import pandas as pd
+import numpy as np
+import os
+import threading
+
+from datos.ingesta import (
+    COLUMNAS, PAISES, TABLA_KPIS, TABLA_PIB_DESEMPLEO,
+    consultar_derivada, consultar_indicador, leer_version_datos, ruta_snapshot,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # sin pyarrow se lee directo de SQL
+    pa = None
+
+# cuanto tiempo (segundos) se guardan en memoria las tablas leidas por el dashboard
+CACHE_TTL = int(os.environ.get("PROYECTO_CACHE_TTL", 3600))
+
+# de donde lee el dashboard: "auto" usa el snapshot de la version actual si
+# existe y si no SQL Server, "sql" siempre lee de SQL Server
+LECTOR = os.environ.get("PROYECTO_LECTOR", "auto")
+
+
+#abre el snapshot de un indicador con memory map, las columnas se leen
+#directo del archivo sin copiarlas. Regresa None si no hay snapshot
+@st.cache_resource(max_entries=32, show_spinner=False)
+def abrir_snapshot(version, indicator):
+    ruta = ruta_snapshot(version, indicator)
+    if pa is None or LECTOR == "sql" or not version or not os.path.exists(ruta):
+        return None
+    return pa.ipc.open_file(pa.memory_map(ruta, "r")).read_all()
+
+
+#filtra paises y columnas directo sobre el snapshot Arrow y solo
+#pasa a pandas lo que se va a usar
+def snapshot_a_pandas(tabla, countries, columnas=None):
+    tabla = tabla.filter(pc.is_in(tabla["pais"], value_set=pa.array(list(countries))))
+    if columnas:
+        tabla = tabla.select(list(columnas))
+    return tabla.to_pandas(split_blocks=True)
+
+
+# primer año del eje de años del cubo, las series del Banco Mundial empiezan en 1960
+ANIO_INICIAL = 1960
+
+
+#cubo pais x indicador x año de una version de datos (NaN donde no hay dato). Se
+#crea vacio y se llena por partes: cada rebanada que piden las paginas solo lee
+#antes de dibujar los paises de su indicador que faltan, y el resto de los paises
+#de ese indicador se carga en segundo plano. Lo comparten todas las sesiones, las
+#paginas nunca lo modifican, solo reciben copias de sus rebanadas
+@st.cache_resource(max_entries=2, show_spinner=False)
+def leer_cubo(version):
+    paises = list(PAISES)
+    indicadores = list(COLUMNAS)
+    anios = np.arange(ANIO_INICIAL, pd.Timestamp.now().year + 1)
+
+    return {
+        "version": version,
+        "paises": paises,
+        "indicadores": indicadores,
+        "anios": anios,
+        "pos_pais": {country: n for n, country in enumerate(paises)},
+        "pos_indicador": {indicator: n for n, indicator in enumerate(indicadores)},
+        "valores": np.full((len(paises), len(indicadores), len(anios)), np.nan),
+        "cargados": set(),   # (indicador, pais) que ya estan en valores
+        "precarga": set(),   # indicadores que ya tienen su hilo de precarga
+        "lock": threading.Lock(),
+    }
+
+
+#lee los paises del indicador que todavia no estan en el cubo, todos juntos: un
+#filtro sobre el snapshot o una sola consulta filtrada por paises en la base.
+#Recibe el snapshot ya abierto porque tambien se usa desde el hilo de precarga
+def cargar_en_cubo(cubo, countries, indicator, tabla):
+    with cubo["lock"]:
+        faltan = [country for country in countries if (indicator, country) not in cubo["cargados"]]
+    if not faltan:
+        return
+
+    column_name = COLUMNAS[indicator]
+    if tabla is not None:
+        df = snapshot_a_pandas(tabla, faltan, columnas=["pais", "date", column_name])
+    else:
+        df = consultar_indicador(faltan, indicator, columnas=["pais", "date", column_name])
+
+    anios = df["date"].to_numpy(dtype=int) - cubo["anios"][0]
+    dentro = (anios >= 0) & (anios < len(cubo["anios"]))
+    filas = pd.Index(cubo["paises"]).get_indexer(df["pais"])
+    with cubo["lock"]:
+        cubo["valores"][filas[dentro], cubo["pos_indicador"][indicator], anios[dentro]] = \
+            df[column_name].to_numpy(dtype=float)[dentro]
+        cubo["cargados"].update((indicator, country) for country in faltan)
+
+
+#carga en un hilo los paises del catalogo que faltan de un indicador, una sola
+#vez por cubo e indicador, para cuando se agreguen a la seleccion
+def precargar(cubo, indicator, tabla):
+    with cubo["lock"]:
+        if indicator in cubo["precarga"]:
+            return
+        cubo["precarga"].add(indicator)
+
+    def cargar():
+        try:
+            cargar_en_cubo(cubo, cubo["paises"], indicator, tabla)
+        except Exception as e:
+            print(f"[WARN] precarga de {indicator} fallo: {e}")
+
+    threading.Thread(target=cargar, daemon=True).start()
+
+
+#se asegura de que los paises pedidos ya esten en el cubo y arranca la precarga del resto
+def asegurar(cubo, countries, indicator):
+    tabla = abrir_snapshot(cubo["version"], indicator)
+    cargar_en_cubo(cubo, countries, indicator, tabla)
+    precargar(cubo, indicator, tabla)
+
+
+#cubo de la version de datos actual
+def read_cubo():
+    return leer_cubo(leer_version_datos())
+
+
+#años de desde a hasta y matriz paises x años de un indicador. Lee del cubo lo que
+#falte de esos paises y regresa una copia, el cubo lo siguen llenando otros hilos
+def rebanada(cubo, countries, indicator, desde=None, hasta=None):
+    asegurar(cubo, countries, indicator)
+    anios = cubo["anios"]
+    a0 = 0 if desde is None else int(np.searchsorted(anios, desde))
+    a1 = len(anios) if hasta is None else int(np.searchsorted(anios, hasta, side="right"))
+    filas = [cubo["pos_pais"][country] for country in countries]
+    with cubo["lock"]:
+        return anios[a0:a1], cubo["valores"][filas, cubo["pos_indicador"][indicator], a0:a1]
+
+
+#tabla año x pais de un indicador (lo que antes se armaba con pivot), sin los
+#años donde ninguno de los paises tiene dato
+def tabla_cubo(cubo, countries, indicator, desde=None, hasta=None):
+    anios, valores = rebanada(cubo, countries, indicator, desde, hasta)
+    tabla = pd.DataFrame(valores.T, index=pd.Index(anios, name="date"), columns=list(countries))
+    return tabla.dropna(how="all")
+
+
+#serie (date, columna) de un pais sin los años vacios, sirve para calcular_kpis
+def serie_cubo(cubo, country, indicator, desde=None, hasta=None):
+    anios, valores = rebanada(cubo, [country], indicator, desde, hasta)
+    hay = ~np.isnan(valores[0])
+    return pd.DataFrame({"date": anios[hay], COLUMNAS[indicator]: valores[0][hay]})
+
+
+#ultimo dato de cada pais en el rango (pais, date, columna), se busca el ultimo
+#año no vacio de todos los paises a la vez sobre el eje de años
+def ultimos_cubo(cubo, countries, indicator, desde=None, hasta=None):
+    anios, valores = rebanada(cubo, countries, indicator, desde, hasta)
+    hay = ~np.isnan(valores)
+    if not hay.size:
+        return pd.DataFrame(columns=["pais", "date", COLUMNAS[indicator]])
+    posicion = valores.shape[1] - 1 - np.argmax(hay[:, ::-1], axis=1)
+    con_dato = hay.any(axis=1)
+    return pd.DataFrame({
+        "pais": np.array(list(countries))[con_dato],
+        "date": anios[posicion][con_dato],
+        COLUMNAS[indicator]: valores[np.arange(len(valores)), posicion][con_dato],
+    })
+
+
+#varios indicadores de un pais unidos por año (date, columnas), solo los años
+#donde estan todos, igual que un merge inner
+def pais_cubo(cubo, country, indicators, desde=None, hasta=None):
+    tabla = pd.concat(
+        [serie_cubo(cubo, country, indicator, desde, hasta).set_index("date") for indicator in indicators],
+        axis=1, join="inner"
+    )
+    return tabla.reset_index()
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=16, show_spinner=False)
+def leer_derivada_cacheada(nombre, version):
+    tabla = abrir_snapshot(version, nombre)
+    if tabla is not None:
+        return tabla.to_pandas()
+    return consultar_derivada(nombre)
+
+
+#KPIs ya calculados de un indicador, un renglon por pais (el indice es el pais)
+def read_kpis(indicator):
+    kpis = leer_derivada_cacheada(TABLA_KPIS, leer_version_datos())
+    if kpis.empty:
+        return kpis
+    return kpis[kpis["indicador"] == indicator].set_index("pais")
+
+
+#PIB y Desempleo de un pais ya unidos por año (date, PIB, Desempleo), opcionalmente
+#solo de desde a hasta. Es una tabla chica que se lee completa una vez por version
+def read_pib_desempleo(country, desde=None, hasta=None):
+    df = leer_derivada_cacheada(TABLA_PIB_DESEMPLEO, leer_version_datos())
+    if df.empty:
+        return df
+    filtro = df["pais"] == country
+    if desde is not None:
+        filtro &= df["date"] >= desde
+    if hasta is not None:
+        filtro &= df["date"] <= hasta
+    return df[filtro].drop(columns="pais").sort_values("date", ignore_index=True)
@@ -1,38 +1,22 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-import pandas as pd
-from Proyecto_Final import read_table_sql
+from datos.lectura import read_cubo, pais_cubo, read_pib_desempleo, read_kpis
+from datos.ingesta import calcular_kpis
 
 
 
-# Cargar tablas
-df_gdp = read_table_sql("MX_NY_GDP_MKTP_KD_ZG")
-df_unem = read_table_sql("MX_SL_UEM_TOTL_ZS")
-
-(tab1,) = st.tabs(["🇲🇽 PIB y Desempleo"])
-
-with tab1:
-
-    st.subheader("📈 Desempeño Económico de México: PIB y Desempleo")
-
-    # Validación
-    if df_gdp is None or df_unem is None or df_gdp.empty or df_unem.empty:
-        st.error("Error cargando tablas desde SQL.")
-        st.stop()
-
-    # limpieza y union
-    df_gdp = df_gdp.rename(columns={"date": "Year", "PIB": "PIB"})
-    df_unem = df_unem.rename(columns={"date": "Year", "Desempleo": "Desempleo"})
-
-    # convertimos year a entero
-    df_gdp["Year"] = df_gdp["Year"].astype(int)
-    df_unem["Year"] = df_unem["Year"].astype(int)
-
-    # unimos
-    df = pd.merge(df_gdp, df_unem, on="Year", how="inner").sort_values("Year")
-
+# Cargar tablas, el PIB y el desempleo ya vienen unidos por año desde el --update.
+# Si la tabla derivada todavia no existe se toman del cubo compartido
+df = read_pib_desempleo("MX")
+if df.empty:
+    df = pais_cubo(read_cubo(), "MX", ["NY.GDP.MKTP.KD.ZG", "SL.UEM.TOTL.ZS"])
 
+# todo lo que depende del slider va en un fragmento, al moverlo solo se vuelve
+# a ejecutar esta parte (no la carga de la tabla ni las pestañas).
+# Los KPIs se dibujan primero y las graficas despues
+@st.fragment
+def panel(df):
     # slider
     min_year, max_year = df["Year"].min(), df["Year"].max()
 
@@ -46,8 +30,15 @@ with tab1:
     # filtrar
     filtered = df[(df["Year"] >= rango[0]) & (df["Year"] <= rango[1])]
 
-    ultimo = filtered.iloc[-1]
-    penultimo = filtered.iloc[-2]
+    # KPIs: con el rango completo se usan los que calculo el --update,
+    # si el usuario movio el slider se calculan sobre los años filtrados
+    kpi_pib = read_kpis("NY.GDP.MKTP.KD.ZG").to_dict("index").get("MX")
+    kpi_des = read_kpis("SL.UEM.TOTL.ZS").to_dict("index").get("MX")
+    rango_completo = rango == (min_year, max_year)
+    if not (rango_completo and kpi_pib and kpi_des
+            and kpi_pib["ultimo_anio"] == kpi_des["ultimo_anio"] == max_year):
+        kpi_pib = calcular_kpis("MX", "NY.GDP.MKTP.KD.ZG", filtered.rename(columns={"Year": "date"}), "PIB")
+        kpi_des = calcular_kpis("MX", "SL.UEM.TOTL.ZS", filtered.rename(columns={"Year": "date"}), "Desempleo")
 
     # metricas
     st.markdown("### 🧮 Indicadores Clave (México)")
@@ -56,19 +47,19 @@ with tab1:
 
     k1.metric(
         "🇲🇽 PIB Actual",
-        f"{ultimo['PIB']:.2f}%",
-        f"{ultimo['PIB'] - penultimo['PIB']:.2f}%"
+        f"{kpi_pib['ultimo_valor']:.2f}%",
+        f"{kpi_pib['variacion']:.2f}%"
     )
 
     k2.metric(
         "💼 Desempleo Actual",
-        f"{ultimo['Desempleo']:.2f}%",
-        f"{ultimo['Desempleo'] - penultimo['Desempleo']:.2f}%"
+        f"{kpi_des['ultimo_valor']:.2f}%",
+        f"{kpi_des['variacion']:.2f}%"
     )
 
     # promedios últimos 5 años
-    promedio_pib = filtered.tail(5)["PIB"].mean()
-    promedio_des = filtered.tail(5)["Desempleo"].mean()
+    promedio_pib = kpi_pib["promedio_5"]
+    promedio_des = kpi_des["promedio_5"]
 
     k3.metric("📌 PIB Promedio 5 años", f"{promedio_pib:.2f}%")
     k4.metric("📌 Desempleo Promedio 5 años", f"{promedio_des:.2f}%")
@@ -147,12 +138,33 @@ with tab1:
     # resumen
     st.markdown("### 📝 Resumen de los datos")
 
-    cambio_pib = ultimo["PIB"] - penultimo["PIB"]
-    cambio_des = ultimo["Desempleo"] - penultimo["Desempleo"]
+    cambio_pib = kpi_pib["variacion"]
+    cambio_des = kpi_des["variacion"]
 
     st.info(
-        f"• El PIB más reciente es **{ultimo['PIB']:.2f}%**, variando **{cambio_pib:.2f}%**.\n"
-        f"• El desempleo actual es **{ultimo['Desempleo']:.2f}%**, cambiando **{cambio_des:.2f}%**.\n"
+        f"• El PIB más reciente es **{kpi_pib['ultimo_valor']:.2f}%**, variando **{cambio_pib:.2f}%**.\n"
+        f"• El desempleo actual es **{kpi_des['ultimo_valor']:.2f}%**, cambiando **{cambio_des:.2f}%**.\n"
         f"• Promedio reciente del PIB: **{promedio_pib:.2f}%**.\n"
         f"• Promedio reciente del desempleo: **{promedio_des:.2f}%**."
     )
+
+
+(tab1,) = st.tabs(["🇲🇽 PIB y Desempleo"])
+
+with tab1:
+
+    st.subheader("📈 Desempeño Económico de México: PIB y Desempleo")
+
+    # Validación
+    if df is None or df.empty:
+        st.error("Error cargando tablas desde SQL.")
+        st.stop()
+
+    # limpieza, renombramos (rename hace una copia) y convertimos year a entero
+    df = df.rename(columns={"date": "Year"})
+    df["Year"] = df["Year"].astype(int)
+    df = df.sort_values("Year")
+
+
+    # slider, KPIs y graficas en su fragmento
+    panel(df)
@@ -2,56 +2,86 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from Proyecto_Final import read_table_sql
+from datos.lectura import read_cubo, tabla_cubo, serie_cubo, ultimos_cubo, read_kpis
+from datos.ingesta import calcular_kpis, PAISES
 
 # diccionario de paises
-paises_dict = {
-    "MX": "México",
-    "US": "Estados Unidos",
-    "CA": "Canadá",
-    "ES": "España",
-    "BR": "Brasil",
-    "AR": "Argentina",
-    "CL": "Chile",
-    "CO": "Colombia",
-    "PE": "Perú",
-    "JP": "Japón",
-    "KR": "Corea del Sur",
-    "GB": "Reino Unido",
-    "DE": "Alemania",
-    "FR": "Francia",
-    "IT": "Italia"
-}
-
-# carga las tablas de inflacion
-df_list = []
-
-for code, nombre in paises_dict.items():
-    try:
-        df = read_table_sql(f"{code}_FP_CPI_TOTL_ZG")
-        df["País"] = nombre
-        df_list.append(df)
-    except:
-        pass  # Ignorar si un país no tiene datos
-
-# unificar
-df_all = pd.concat(df_list, ignore_index=True)
-df_all["date"] = df_all["date"].astype(int)
-df_all["Inflación"] = df_all["Inflación"].astype(float)
-df_all = df_all.sort_values("date")
+# sale del catalogo.json, es el mismo para todas las paginas
+paises_dict = PAISES
+codigos = {name: code for code, name in paises_dict.items()}
+
+# cubo pais x indicador x año compartido por todas las sesiones, la tabla
+# año x pais de la inflacion es una rebanada (no se lee ni se pivotea nada)
+cubo = read_cubo()
+tabla_inf = tabla_cubo(cubo, paises_dict.keys(), "FP.CPI.TOTL.ZG")
+tabla_inf.columns = pd.Index(paises_dict.values(), name="País")
+
+# comparacion de Mexico contra el pais que elija el usuario
+def comparacion(tabla):
+    paises_disponibles = [p for p in paises_dict.values() if p != "México"]
 
-# ================================================================
-(tab2,) = st.tabs(["📉 Inflación"])
-# ================================================================
+    pais_seleccionado = st.selectbox(
+        "Selecciona un país para comparar:",
+        paises_disponibles
+    )
 
-with tab2:
+    df_compare = tabla[["México", pais_seleccionado]].dropna(how="all")
+
+    fig_comp = px.line(
+        df_compare,
+        markers=True,
+        labels={"value": "Inflación"},
+        title=f"📊 Comparación: México vs {pais_seleccionado}",
+        template="plotly_white"
+    )
+    fig_comp.update_traces(line_width=3, connectgaps=True)
+    st.plotly_chart(fig_comp, use_container_width=True)
 
-    st.subheader("📈 Inflación en México y Comparativa Internacional ")
     st.markdown("---")
 
-    # SLIDER
+    st.subheader(f"📋 Comparación histórica: México vs {pais_seleccionado}")
+
+    st.dataframe(df_compare, use_container_width=True)
+
+
+# barras del ultimo dato de los paises que elija el usuario
+def barras(df_last):
+    # selector de paises para la grafica
+    paises_disponibles_barras = sorted(df_last["País"].unique())
+    paises_seleccionados_barras = st.multiselect(
+        "Selecciona los países a mostrar:",
+        options=paises_disponibles_barras,
+        default=paises_disponibles_barras  # Mostrar todos por defecto
+    )
+
+    # filtrar paises solo los elegidos
+    df_last_filtrado = df_last[df_last["País"].isin(paises_seleccionados_barras)]
 
-    min_year, max_year = int(df_all["date"].min()), int(df_all["date"].max())
+    # grafica
+    fig_barras = px.bar(
+        df_last_filtrado,
+        x="País",
+        y="Inflación",
+        text="Inflación",
+        title="Inflación actual (último año disponible)",
+        template="plotly_white"
+    )
+
+    fig_barras.update_traces(
+        texttemplate='%{text:.2f}%',
+        textposition='outside'
+    )
+
+    st.plotly_chart(fig_barras, use_container_width=True)
+
+
+# todo lo que depende del slider va en un fragmento, igual que en las otras
+# paginas: al mover el slider, cambiar el pais a comparar o los paises de las
+# barras solo se vuelve a ejecutar el panel (no la carga del cubo ni las pestañas).
+# Los KPIs se dibujan primero y las graficas despues
+@st.fragment
+def panel(tabla_inf):
+    min_year, max_year = int(tabla_inf.index.min()), int(tabla_inf.index.max())
 
     año_min, año_max = st.slider(
         "📅 Selecciona el rango de años a visualizar",
@@ -60,37 +90,42 @@ with tab2:
         value=(min_year, max_year)
     )
 
-    df_filtered = df_all[
-        (df_all["date"] >= año_min) & (df_all["date"] <= año_max)
-        ]
+    tabla = tabla_inf.loc[año_min:año_max]
 
     st.markdown("---")
 
     # metricas de mexico
-    df_mex = df_filtered[df_filtered["País"] == "México"]
+    df_mex = serie_cubo(cubo, "MX", "FP.CPI.TOTL.ZG", año_min, año_max)
 
-    col1, col2, col3 = st.columns(3)
+    # KPIs: con el rango completo se usan los que calculo el --update,
+    # si el usuario movio el slider se calculan sobre los años filtrados
+    kpis = read_kpis("FP.CPI.TOTL.ZG")
+    rango_completo = (año_min, año_max) == (min_year, max_year)
 
-    if len(df_mex) >= 2:
-        ultimo = df_mex.iloc[-1]
-        penultimo = df_mex.iloc[-2]
+    kpi_mex = None
+    if rango_completo and "MX" in kpis.index:
+        kpi_mex = kpis.loc["MX"]
+    elif len(df_mex) >= 2:
+        kpi_mex = calcular_kpis("MX", "FP.CPI.TOTL.ZG", df_mex, "Inflación")
 
+    col1, col2, col3 = st.columns(3)
+
+    if kpi_mex is not None:
         col1.metric(
             "🔥 Inflación actual en México",
-            f"{ultimo['Inflación']:.2f}%",
-            f"{ultimo['Inflación'] - penultimo['Inflación']:.2f}%"
+            f"{kpi_mex['ultimo_valor']:.2f}%",
+            f"{kpi_mex['variacion']:.2f}%"
         )
 
         col2.metric(
             "📊 Promedio histórico",
-            f"{df_mex['Inflación'].mean():.2f}%"
+            f"{kpi_mex['promedio_total']:.2f}%"
         )
 
-        max_row = df_mex.loc[df_mex["Inflación"].idxmax()]
         col3.metric(
             "📈 Máxima registrada",
-            f"{max_row['Inflación']:.2f}%",
-            int(max_row["date"])
+            f"{kpi_mex['maximo_valor']:.2f}%",
+            int(kpi_mex["maximo_anio"])
         )
 
     st.markdown("---")
@@ -99,36 +134,7 @@ with tab2:
     # comparamos a mexico contra otros paises para analizarlos
     st.subheader("🇲🇽 Compararacion de México contra otro país")
 
-    paises_disponibles = [p for p in paises_dict.values() if p != "México"]
-
-    pais_seleccionado = st.selectbox(
-        "Selecciona un país para comparar:",
-        paises_disponibles
-    )
-
-    df_compare = df_filtered[
-        df_filtered["País"].isin(["México", pais_seleccionado])
-    ]
-
-    fig_comp = px.line(
-        df_compare,
-        x="date",
-        y="Inflación",
-        color="País",
-        markers=True,
-        title=f"📊 Comparación: México vs {pais_seleccionado}",
-        template="plotly_white"
-    )
-    fig_comp.update_traces(line_width=3)
-    st.plotly_chart(fig_comp, use_container_width=True)
-
-    st.markdown("---")
-
-    st.subheader(f"📋 Comparación histórica: México vs {pais_seleccionado}")
-
-    df_comp_table = df_compare.pivot(index="date", columns="País", values="Inflación")
-
-    st.dataframe(df_comp_table, use_container_width=True)
+    comparacion(tabla)
 
     st.markdown("---")
 
@@ -136,52 +142,43 @@ with tab2:
 
     col1, col2, col3 = st.columns(3)
 
-    # tendencia del último año
-    tendencia = ultimo["Inflación"] - penultimo["Inflación"]
-    col1.metric("📈 Variación anual", f"{tendencia:.2f}%")
+    if kpi_mex is not None:
+        # tendencia del último año
+        tendencia = kpi_mex["variacion"]
+        col1.metric("📈 Variación anual", f"{tendencia:.2f}%")
 
-    # promedio últimos 10 años
-    prom_10 = df_mex.tail(10)["Inflación"].mean()
-    col2.metric("📊 Promedio últimos 10 años", f"{prom_10:.2f}%")
+        # promedio últimos 10 años
+        prom_10 = kpi_mex["promedio_10"]
+        col2.metric("📊 Promedio últimos 10 años", f"{prom_10:.2f}%")
 
-    # dirección de los resultados
-    dif_serie = df_mex["Inflación"].diff().dropna()
-    racha = "🔥 Subiendo" if dif_serie.tail(3).mean() > 0 else "❄️ Bajando"
-    col3.metric("📉 Tendencia reciente", racha)
+        # dirección de los resultados
+        racha = "🔥 Subiendo" if kpi_mex["tendencia_3"] > 0 else "❄️ Bajando"
+        col3.metric("📉 Tendencia reciente", racha)
 
     st.markdown("---")
 
     st.subheader("📊 Inflación más reciente por país")
 
-    # obtener ultimo dato por país
-    df_last = (
-        df_filtered.sort_values("date").groupby("País").tail(1)
-    )
+    # ultimo dato por país en el rango, se busca en el cubo para todos a la vez
+    df_last = ultimos_cubo(cubo, paises_dict.keys(), "FP.CPI.TOTL.ZG", año_min, año_max)
+    df_last = df_last.assign(País=df_last["pais"].map(paises_dict))
 
-    # selector de paises para la grafica
-    paises_disponibles_barras = sorted(df_last["País"].unique())
-    paises_seleccionados_barras = st.multiselect(
-        "Selecciona los países a mostrar:",
-        options=paises_disponibles_barras,
-        default=paises_disponibles_barras  # Mostrar todos por defecto
-    )
+    barras(df_last)
 
-    # filtrar paises solo los elegidos
-    df_last_filtrado = df_last[df_last["País"].isin(paises_seleccionados_barras)]
 
-    # grafica
-    fig_barras = px.bar(
-        df_last_filtrado,
-        x="País",
-        y="Inflación",
-        text="Inflación",
-        title="Inflación actual (último año disponible)",
-        template="plotly_white"
-    )
+# ================================================================
+(tab2,) = st.tabs(["📉 Inflación"])
+# ================================================================
 
-    fig_barras.update_traces(
-        texttemplate='%{text:.2f}%',
-        textposition='outside'
-    )
+with tab2:
 
-    st.plotly_chart(fig_barras, use_container_width=True)
+    st.subheader("📈 Inflación en México y Comparativa Internacional ")
+    st.markdown("---")
+
+    # validamos que hayan cargado
+    if tabla_inf.empty:
+        st.error("No se pudieron obtener datos de inflación.")
+        st.stop()
+
+    # slider, KPIs y graficas en su fragmento
+    panel(tabla_inf)
@@ -1,80 +1,39 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from Proyecto_Final import read_table_sql
+from datos.lectura import read_cubo, tabla_cubo, ultimos_cubo, read_kpis
+from datos.ingesta import PAISES
 
 
 # diccionario de paises
 
-paises_dict = {
-    "MX": "México",
-    "US": "Estados Unidos",
-    "CA": "Canadá",
-    "ES": "España",
-    "BR": "Brasil",
-    "AR": "Argentina",
-    "CL": "Chile",
-    "CO": "Colombia",
-    "PE": "Perú",
-    "JP": "Japón",
-    "KR": "Corea del Sur",
-    "GB": "Reino Unido",
-    "DE": "Alemania",
-    "FR": "Francia",
-    "IT": "Italia"
-}
-
-
-# funcion para cargar PIB
-def cargar_pib(codigo):
-    df = read_table_sql(f"{codigo}_NY_GDP_MKTP_KD_ZG")
-    if df is None or df.empty:
-        return None
-    df = df.rename(columns={"date": "Year", "Value": "PIB"})
-    df["Year"] = df["Year"].astype(int)
-    df["PIB"] = df["PIB"].astype(float)
-    df = df.sort_values("Year")
-    return df
-
-
-
-# cargar todos los paises en un diccionario
-
-data_pib = {}
-for code, name in paises_dict.items():
-    df_tmp = cargar_pib(code)
-    if df_tmp is not None:
-        df_tmp["País"] = name
-        data_pib[name] = df_tmp
+# sale del catalogo.json, es el mismo para todas las paginas
+paises_dict = PAISES
+codigos = {name: code for code, name in paises_dict.items()}
 
 
-(tab3,) = st.tabs(["🌎 PIB Internacional"])
-
-with tab3:
-
-    st.subheader("🌍 Comparación Internacional del Crecimiento del PIB ")
-    # validamos que hayan cargado
-    if not data_pib:
-        st.error("No se pudieron obtener datos del PIB desde SQL Server")
-        st.stop()
-
-
-    paises_seleccion = st.multiselect(
-        "Elige uno o varios países:",
-        list(data_pib.keys()),
-        default=["México", "Estados Unidos"]
-    )
-
-    if not paises_seleccion:
-        st.warning("Selecciona al menos un país para visualizar datos.")
-        st.stop()
+# cubo pais x indicador x año compartido por todas las sesiones, aqui solo se
+# toman rebanadas del PIB de los paises seleccionados (los demas se cargan en
+# segundo plano)
+cubo = read_cubo()
 
-    # concatenar los df seleccionados
-    df_all = pd.concat([data_pib[p] for p in paises_seleccion], ignore_index=True)
+# KPIs calculados por el --update, un renglon por pais. Los paises que tienen
+# KPIs son los que tienen datos, con eso se arma el selector sin leer las series
+kpis = read_kpis("NY.GDP.MKTP.KD.ZG")
+if kpis.empty:
+    disponibles = list(paises_dict.values())
+else:
+    disponibles = [name for code, name in paises_dict.items() if code in kpis.index]
 
 
+# el slider de años solo afecta la tabla y las graficas, por eso van en un
+# fragmento: al moverlo no se vuelven a ejecutar el selector ni los KPIs.
+# Las graficas se dibujan despues de los KPIs
+@st.fragment
+def historico(tabla_pib, seleccion):
     # rango dinamico de años
-    min_year, max_year = df_all["Year"].min(), df_all["Year"].max()
+    min_year = tabla_pib.index.min()
+    max_year = tabla_pib.index.max()
 
     año_min, año_max = st.slider(
         "📅 Rango de años a visualizar",
@@ -83,59 +42,34 @@ with tab3:
         value=(int(min_year), int(max_year))
     )
 
-    df_filtered = df_all[(df_all["Year"] >= año_min) & (df_all["Year"] <= año_max)]
-
+    tabla = tabla_pib.loc[año_min:año_max]
 
-    # KPIs
-    st.subheader("📊 Indicadores clave del PIB")
 
-    cols = st.columns(len(paises_seleccion))
-
-    for i, pais in enumerate(paises_seleccion):
-        df = data_pib[pais]
-
-        if len(df) >= 2:
-            ult = df.iloc[-1]["PIB"]
-            ant = df.iloc[-2]["PIB"]
-        else:
-            ult, ant = 0, 0
-
-        cols[i].metric(
-            label=f"{pais} – PIB actual",
-            value=f"{ult:.2f}%",
-            delta=f"{ult - ant:.2f}%"
-        )
-
-
-    # comparacion historica (tabla pivote)
+    # comparacion historica (tabla pivote), sale directo del cubo
     st.subheader("📋 Comparación histórica (últimos 15 años)")
 
-    tabla = df_filtered.pivot(index="Year", columns="País", values="PIB")
-    tabla = tabla.sort_index(ascending=False).head(15).sort_index()
-
-    st.dataframe(tabla, use_container_width=True)
+    st.dataframe(tabla.sort_index(ascending=False).head(15).sort_index(), use_container_width=True)
 
 
-    #linea historica
+    #linea historica, plotly acepta la tabla ancha (una linea por columna)
     st.subheader("📉 Tendencia del crecimiento del PIB")
 
     fig_line = px.line(
-        df_filtered,
-        x="Year",
-        y="PIB",
-        color="País",
+        tabla,
         markers=True,
+        labels={"value": "PIB"},
         title="Tendencia del Crecimiento Económico"
     )
-    fig_line.update_traces(line_width=3)
+    fig_line.update_traces(line_width=3, connectgaps=True)
     st.plotly_chart(fig_line, use_container_width=True)
 
 
 
-    # barras del ultimo dato disponible por pais
+    # barras del ultimo dato disponible por pais en el rango
     st.subheader("🏁 Último dato disponible por país")
 
-    ultimos = df_filtered.sort_values("Year").groupby("País").tail(1)
+    ultimos = ultimos_cubo(cubo, seleccion, "NY.GDP.MKTP.KD.ZG", año_min, año_max)
+    ultimos = ultimos.assign(País=ultimos["pais"].map(paises_dict)).rename(columns={"date": "Year"})
 
     fig_bar = px.bar(
         ultimos,
@@ -153,3 +87,66 @@ with tab3:
 
     ranking = ultimos.sort_values("PIB", ascending=False)[["País", "PIB"]]
     st.table(ranking)
+
+
+(tab3,) = st.tabs(["🌎 PIB Internacional"])
+
+with tab3:
+
+    st.subheader("🌍 Comparación Internacional del Crecimiento del PIB ")
+    # validamos que hayan cargado
+    if not disponibles:
+        st.error("No se pudieron obtener datos del PIB desde SQL Server")
+        st.stop()
+
+
+    paises_seleccion = st.multiselect(
+        "Elige uno o varios países:",
+        disponibles,
+        default=[p for p in ["México", "Estados Unidos"] if p in disponibles]
+    )
+
+    if not paises_seleccion:
+        st.warning("Selecciona al menos un país para visualizar datos.")
+        st.stop()
+
+    seleccion = [codigos[p] for p in paises_seleccion]
+
+
+    # tabla año x pais de los paises seleccionados, ya sin años vacios
+    tabla_pib = tabla_cubo(cubo, seleccion, "NY.GDP.MKTP.KD.ZG")
+    tabla_pib.columns = pd.Index(paises_seleccion, name="País")
+    tabla_pib.index.name = "Year"
+    if tabla_pib.empty:
+        st.error("No se pudieron obtener datos del PIB desde SQL Server")
+        st.stop()
+
+
+    # KPIs
+    st.subheader("📊 Indicadores clave del PIB")
+
+    cols = st.columns(len(paises_seleccion))
+
+    for i, pais in enumerate(paises_seleccion):
+        if codigos[pais] in kpis.index:
+            ult = kpis.loc[codigos[pais], "ultimo_valor"]
+            ant = kpis.loc[codigos[pais], "penultimo_valor"]
+        else:
+            serie = tabla_pib[pais].dropna()
+            if len(serie) >= 2:
+                ult = serie.iloc[-1]
+                ant = serie.iloc[-2]
+            else:
+                ult, ant = 0, 0
+        if pd.isna(ant):
+            ult, ant = 0, 0
+
+        cols[i].metric(
+            label=f"{pais} – PIB actual",
+            value=f"{ult:.2f}%",
+            delta=f"{ult - ant:.2f}%"
+        )
+
+
+    # slider, tabla pivote y graficas en su fragmento
+    historico(tabla_pib, seleccion)